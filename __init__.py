@@ -1,38 +1,146 @@
 """The MotionBlinds RS485 integration."""
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import time
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import (
+    Event,
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.typing import ConfigType
-from .const import DOMAIN, ATTR_SCENE, SERVICE_START, SERVICE_STOP
-from homeassistant.const import ATTR_ENTITY_ID, Platform
+from .const import (
+    DOMAIN,
+    DATA_ENTITY_RUNTIMES,
+    DATA_ENTRY_WRITER,
+    DATA_HEALTH,
+    CONF_CONCURRENCY,
+    CONF_FORMAT,
+    CONF_MANIFEST,
+    CONF_NETWORK,
+    CONF_PATH,
+    CONF_SCENE_GROUPS,
+    CONF_THRESHOLD,
+    CONF_WORKERS,
+    ATTR_MAX_CONCURRENCY,
+    ATTR_SCENE,
+    ATTR_SCENES,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_PROFILING_THRESHOLD,
+    DEFAULT_PROVISIONING_WORKERS,
+    SERVICE_PROVISION,
+    SERVICE_SCAN,
+    SERVICE_START,
+    SERVICE_START_PROFILING,
+    SERVICE_STOP,
+    SERVICE_STOP_PROFILING,
+)
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    EVENT_HOMEASSISTANT_STOP,
+    Platform,
+)
 from dataclasses import dataclass
-from collections.abc import Callable
-from typing import Optional
+from collections.abc import Awaitable, Callable
+from typing import Any, Optional
 from homeassistant.helpers import config_validation as cv
 import voluptuous as vol
-from .select import SceneSelect
+from .runtime import (
+    MotionBlindsRS485ConfigEntry,
+    MotionBlindsRS485Runtime,
+    get_entity_runtime,
+)
+from .discovery import async_get_discovery, async_release_discovery
+from .motionblinds_rs485.command_queue import CommandSupersededException
+from .motionblinds_rs485.profiling import Profiler, profiled
+from .motionblinds_rs485.provisioning import InvalidManifestException, parse_manifest
+from .motionblinds_rs485.scanner import DEFAULT_CONCURRENCY as DEFAULT_SCAN_CONCURRENCY
+from .provisioning import async_provision
+from .scanner import async_scan_networks
+from .persistence import ConfigEntryDataWriter
+from .coordinator import MotionBlindsRS485HealthCoordinator
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = []
+PLATFORMS = [Platform.SELECT, Platform.BUTTON, Platform.SENSOR]
+
+# Outcome per entity in the response of the start and stop services
+STATUS_SENT = "sent"
+# Buffered until the box is back, not sent yet
+STATUS_QUEUED = "queued"
+STATUS_SUPERSEDED = "superseded"
+STATUS_FAILED = "failed"
+
+
+SCENE_SERVICE_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_ENTITY_ID): cv.comp_entity_ids,
+            vol.Optional(ATTR_SCENE): vol.All(vol.Coerce(int)),
+            vol.Optional(ATTR_SCENES): vol.All(cv.ensure_list, [vol.Coerce(int)]),
+            vol.Optional(
+                ATTR_MAX_CONCURRENCY, default=DEFAULT_MAX_CONCURRENCY
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_SCENE, ATTR_SCENES),
+)
+
+
+PROVISION_SERVICE_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Exclusive(CONF_MANIFEST, "manifest"): cv.string,
+            vol.Exclusive(CONF_PATH, "manifest"): cv.string,
+            vol.Optional(CONF_FORMAT): vol.In(["yaml", "csv"]),
+            vol.Optional(CONF_WORKERS, default=DEFAULT_PROVISIONING_WORKERS): vol.All(
+                vol.Coerce(int), vol.Range(min=1)
+            ),
+        }
+    ),
+    cv.has_at_least_one_key(CONF_MANIFEST, CONF_PATH),
+)
+
+
+SCAN_SERVICE_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_NETWORK): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(CONF_CONCURRENCY, default=DEFAULT_SCAN_CONCURRENCY): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=1024)
+        ),
+    }
+)
 
 
-SCENE_SERVICE_SCHEMA = vol.Schema(
+START_PROFILING_SERVICE_SCHEMA = vol.Schema(
     {
-        vol.Required(ATTR_ENTITY_ID): cv.comp_entity_ids,
-        vol.Required(ATTR_SCENE): vol.All(vol.Coerce(int)),
+        vol.Optional(CONF_THRESHOLD, default=DEFAULT_PROFILING_THRESHOLD): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
     }
 )
 
 
+def get_scenes(call: ServiceCall) -> list[int]:
+    """Get the scenes of a service call, from both scene and scenes."""
+    scenes = list(call.data.get(ATTR_SCENES, []))
+    if ATTR_SCENE in call.data:
+        scenes.append(call.data[ATTR_SCENE])
+    return scenes
+
+
 @dataclass
 class Service:
     service: str
     service_func: Callable
     schema: Optional[vol.Schema] = None
+    supports_response: SupportsResponse = SupportsResponse.NONE
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
@@ -40,43 +148,223 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 
     _LOGGER.warning("Loading MotionBlinds RS485 integration")
 
+    entry_writer = ConfigEntryDataWriter(hass)
+    hass.data.setdefault(DOMAIN, {})[DATA_ENTRY_WRITER] = entry_writer
+    hass.data[DOMAIN][DATA_HEALTH] = MotionBlindsRS485HealthCoordinator(hass)
+    hass.data[DOMAIN][DATA_ENTITY_RUNTIMES] = {}
+
+    async def flush_entry_writer(event: Event) -> None:
+        entry_writer.async_flush()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, flush_entry_writer)
+
     def generic_entity_service(
-        callback: Callable[[SceneSelect], None]
-    ) -> Callable[[ServiceCall], None]:
-        async def service_func(call: ServiceCall) -> None:
-            for scene_select_entity_id in call.data[ATTR_ENTITY_ID]:
-                scene_select_entity: SceneSelect = hass.data[DOMAIN].get(
-                    scene_select_entity_id
+        callback: Callable[[MotionBlindsRS485Runtime, ServiceCall], Awaitable[bool]]
+    ) -> Callable[[ServiceCall], Awaitable[ServiceResponse]]:
+        @profiled
+        async def service_func(call: ServiceCall) -> ServiceResponse:
+            # Send to all entities at once, a slow or failing box should not
+            # hold up or cancel the others
+            semaphore = asyncio.Semaphore(call.data[ATTR_MAX_CONCURRENCY])
+
+            async def run(entity_id: str) -> dict[str, Any]:
+                if (runtime := get_entity_runtime(hass, entity_id)) is None:
+                    return {
+                        "success": False,
+                        "status": STATUS_FAILED,
+                        "error": "Entity not found",
+                    }
+                # Commands for a box known to be unreachable go to its offline
+                # buffer right away, without waiting for a timeout
+                async with semaphore:
+                    start_time = time.monotonic()
+                    try:
+                        sent = await callback(runtime, call)
+                    except CommandSupersededException:
+                        # A later call for the same scenes replaced this one
+                        # before it was sent, that is not an error
+                        result = {"success": False, "status": STATUS_SUPERSEDED}
+                    except Exception as exception:  # pylint: disable=broad-except
+                        result = {
+                            "success": False,
+                            "status": STATUS_FAILED,
+                            "error": str(exception),
+                        }
+                    else:
+                        result = {
+                            "success": sent,
+                            "status": STATUS_SENT if sent else STATUS_QUEUED,
+                        }
+                    result["duration"] = round(time.monotonic() - start_time, 3)
+                    return result
+
+            entity_ids: list[str] = call.data[ATTR_ENTITY_ID]
+            results = dict(
+                zip(
+                    entity_ids,
+                    await asyncio.gather(*(run(entity_id) for entity_id in entity_ids)),
+                )
+            )
+            failed = {
+                entity_id: result["error"]
+                for entity_id, result in results.items()
+                if result["status"] == STATUS_FAILED
+            }
+            for entity_id, error in failed.items():
+                _LOGGER.error(
+                    "Failed to %s scene on %s: %s", call.service, entity_id, error
+                )
+            if queued := [
+                entity_id
+                for entity_id, result in results.items()
+                if result["status"] == STATUS_QUEUED
+            ]:
+                _LOGGER.warning(
+                    "Queued %s of scene on %s until the box is reachable again",
+                    call.service,
+                    ", ".join(queued),
                 )
-                if scene_select_entity:
-                    await callback(scene_select_entity, call)
+            if call.return_response:
+                return {"entities": results}
+            if failed:
+                raise HomeAssistantError(
+                    f"Failed to {call.service} scene on {', '.join(failed)}"
+                )
+            return None
 
         return service_func
 
-    async def start_service(scene_select: SceneSelect, call: ServiceCall) -> None:
-        print("a")
-        await scene_select.start(str(call.data[ATTR_SCENE]))
+    @profiled
+    async def start_service(
+        runtime: MotionBlindsRS485Runtime, call: ServiceCall
+    ) -> bool:
+        return await runtime.device.start_many(get_scenes(call))
+
+    @profiled
+    async def stop_service(runtime: MotionBlindsRS485Runtime, call: ServiceCall) -> bool:
+        return await runtime.device.stop_many(get_scenes(call))
+
+    def read_manifest(path: str) -> str:
+        with open(path, encoding="utf-8") as manifest:
+            return manifest.read()
 
-    async def stop_service(scene_select: SceneSelect, call: ServiceCall) -> None:
-        print("b")
-        await scene_select.stop(str(call.data[ATTR_SCENE]))
+    @profiled
+    async def provision_service(call: ServiceCall) -> ServiceResponse:
+        if CONF_PATH in call.data:
+            path = hass.config.path(call.data[CONF_PATH])
+            if not hass.config.is_allowed_path(path):
+                raise HomeAssistantError(f"Reading {path} is not allowed")
+            try:
+                text = await hass.async_add_executor_job(read_manifest, path)
+            except OSError as exception:
+                raise HomeAssistantError(f"Cannot read {path}: {exception}")
+            manifest_format = call.data.get(
+                CONF_FORMAT, "csv" if path.lower().endswith(".csv") else None
+            )
+        else:
+            text = call.data[CONF_MANIFEST]
+            manifest_format = call.data.get(CONF_FORMAT)
+        try:
+            entries = parse_manifest(text, manifest_format)
+        except InvalidManifestException as exception:
+            raise HomeAssistantError(f"Invalid manifest: {exception}")
+        summary = await async_provision(hass, entries, call.data[CONF_WORKERS])
+        return {"boxes": summary} if call.return_response else None
+
+    @profiled
+    async def scan_service(call: ServiceCall) -> ServiceResponse:
+        try:
+            results = await async_scan_networks(
+                hass, call.data[CONF_NETWORK], call.data[CONF_CONCURRENCY]
+            )
+        except ValueError as exception:
+            raise HomeAssistantError(f"Invalid network: {exception}")
+        if not call.return_response:
+            return None
+        configured = {
+            entry.unique_id for entry in hass.config_entries.async_entries(DOMAIN)
+        }
+        return {
+            "boxes": [
+                {
+                    "address": result.address,
+                    "hostname": result.hostname,
+                    "supports_batch": result.supports_batch,
+                    "configured": result.hostname in configured,
+                }
+                for result in results
+            ]
+        }
+
+    async def start_profiling_service(call: ServiceCall) -> None:
+        Profiler.shared().start(call.data[CONF_THRESHOLD] / 1000)
+        _LOGGER.warning(
+            "Profiling started, stop it with %s.%s", DOMAIN, SERVICE_STOP_PROFILING
+        )
+
+    def write_report(path: str, report: dict[str, Any]) -> None:
+        with open(path, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    async def stop_profiling_service(call: ServiceCall) -> ServiceResponse:
+        profiler = Profiler.shared()
+        if not profiler.enabled:
+            raise HomeAssistantError("Profiling is not running")
+        profiler.stop()
+        report = profiler.report()
+        path = hass.config.path(f"{DOMAIN}_profile_{int(time.time())}.json")
+        await hass.async_add_executor_job(write_report, path, report)
+        _LOGGER.warning(
+            "Profiling stopped, %s event loop stalls, report written to %s",
+            len(report["stalls"]),
+            path,
+        )
+        return {"path": path, **report} if call.return_response else None
 
     services = [
+        Service(
+            SERVICE_PROVISION,
+            provision_service,
+            PROVISION_SERVICE_SCHEMA,
+            SupportsResponse.OPTIONAL,
+        ),
+        Service(
+            SERVICE_SCAN,
+            scan_service,
+            SCAN_SERVICE_SCHEMA,
+            SupportsResponse.OPTIONAL,
+        ),
+        Service(
+            SERVICE_START_PROFILING,
+            start_profiling_service,
+            START_PROFILING_SERVICE_SCHEMA,
+        ),
+        Service(
+            SERVICE_STOP_PROFILING,
+            stop_profiling_service,
+            supports_response=SupportsResponse.OPTIONAL,
+        ),
         Service(
             SERVICE_START,
             generic_entity_service(start_service),
             SCENE_SERVICE_SCHEMA,
+            SupportsResponse.OPTIONAL,
         ),
         Service(
             SERVICE_STOP,
             generic_entity_service(stop_service),
             SCENE_SERVICE_SCHEMA,
+            SupportsResponse.OPTIONAL,
         ),
     ]
 
     for serv in services:
         hass.services.async_register(
-            DOMAIN, serv.service, serv.service_func, schema=serv.schema
+            DOMAIN,
+            serv.service,
+            serv.service_func,
+            schema=serv.schema,
+            supports_response=serv.supports_response,
         )
 
     _LOGGER.warning("Done registering services")
@@ -84,24 +372,44 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     return True
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+@profiled
+async def async_setup_entry(
+    hass: HomeAssistant, entry: MotionBlindsRS485ConfigEntry
+) -> bool:
     """Set up MotionBlinds RS485 device from a config entry."""
 
     _LOGGER.info("Entering async_setup_entry")
 
-    hass.data.setdefault(DOMAIN, {})
+    entry.async_on_unload(entry.add_update_listener(async_update_listener))
+
+    discovery = await async_get_discovery(hass)
+    entry.runtime_data = MotionBlindsRS485Runtime(hass, entry, discovery)
+    entry.runtime_data.async_start()
 
-    await hass.config_entries.async_forward_entry_setups(entry, [Platform.SELECT])
-    await hass.config_entries.async_forward_entry_setups(entry, [Platform.BUTTON])
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     _LOGGER.info("Fully loaded entity")
     return True
 
 
-async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+@profiled
+async def async_update_listener(
+    hass: HomeAssistant, entry: MotionBlindsRS485ConfigEntry
+) -> None:
+    """Reload when the scene groups changed, other updates are applied in place."""
+    if entry.options.get(CONF_SCENE_GROUPS, {}) != entry.runtime_data.scene_groups:
+        await hass.config_entries.async_reload(entry.entry_id)
+
+
+@profiled
+async def async_unload_entry(
+    hass: HomeAssistant, entry: MotionBlindsRS485ConfigEntry
+) -> bool:
     """Unload MotionBlinds RS485 device from a config entry."""
 
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        await entry.runtime_data.async_stop()
+        hass.data[DOMAIN][DATA_ENTRY_WRITER].async_flush_entry(entry.entry_id)
+        await async_release_discovery(hass)
 
     return unload_ok
@@ -1,4 +1,5 @@
 """Button entities for the MotionBlinds RS485 integration."""
+from __future__ import annotations
 
 import logging
 
@@ -6,15 +7,31 @@ from homeassistant.components.button import (
     ButtonEntity,
     ButtonEntityDescription,
 )
-from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EntityCategory
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import ATTR_START, ATTR_STOP, DOMAIN, ICON_START, ICON_STOP
-from .select import SceneSelect
+from .const import (
+    ATTR_FAILED,
+    ATTR_QUEUED,
+    ATTR_SPREAD,
+    ATTR_START,
+    ATTR_STOP,
+    CONF_SCENE_GROUPS,
+    DATA_HEALTH,
+    DOMAIN,
+    ICON_SCENE_GROUP,
+    ICON_START,
+    ICON_STOP,
+)
+from .motionblinds_rs485.group import GroupDispatchResult, SceneGroup
+from .motionblinds_rs485.profiling import profiled
+from .runtime import MotionBlindsRS485ConfigEntry, MotionBlindsRS485Runtime, get_runtime
 from collections.abc import Callable
 from dataclasses import dataclass
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import slugify
+from typing import Any
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -23,15 +40,15 @@ PARALLEL_UPDATES = 0
 
 @dataclass
 class CommandButtonEntityDescription(ButtonEntityDescription):
-    command_callback: Callable[[SceneSelect], None] | None = None
+    command_callback: Callable[[MotionBlindsRS485Runtime], None] | None = None
 
 
-async def command_start(scene_select: SceneSelect) -> None:
-    await scene_select.start()
+async def command_start(runtime: MotionBlindsRS485Runtime) -> None:
+    await runtime.start()
 
 
-async def command_stop(scene_select: SceneSelect) -> None:
-    await scene_select.stop()
+async def command_stop(runtime: MotionBlindsRS485Runtime) -> None:
+    await runtime.stop()
 
 
 BUTTON_TYPES: dict[str, CommandButtonEntityDescription] = {
@@ -55,17 +72,24 @@ BUTTON_TYPES: dict[str, CommandButtonEntityDescription] = {
 
 
 async def async_setup_entry(
-    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+    hass: HomeAssistant,
+    entry: MotionBlindsRS485ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up buttons based on a config entry."""
-    scene_select: SceneSelect = hass.data[DOMAIN][entry.entry_id]
+    runtime = entry.runtime_data
 
     _LOGGER.info("Setting up buttons")
     async_add_entities(
         [
-            GenericCommandButton(scene_select, entity_description)
+            GenericCommandButton(runtime, entity_description)
             for entity_description in BUTTON_TYPES.values()
         ]
+        + [
+            SceneGroupButton(runtime, name, members, command)
+            for name, members in entry.options.get(CONF_SCENE_GROUPS, {}).items()
+            for command in (ATTR_START, ATTR_STOP)
+        ]
     )
 
 
@@ -74,16 +98,84 @@ class GenericCommandButton(ButtonEntity):
 
     def __init__(
         self,
-        scene_select: SceneSelect,
+        runtime: MotionBlindsRS485Runtime,
         entity_description: CommandButtonEntityDescription,
     ) -> None:
         """Initialize the command button."""
         _LOGGER.info(f"Setting up {entity_description.key} button")
         self.entity_description = entity_description
-        self._scene_select = scene_select
-        self._attr_unique_id = f"{scene_select.unique_id}_{entity_description.key}"
-        self._attr_device_info = scene_select.device_info
+        self._runtime = runtime
+        self._attr_unique_id = f"{runtime.unique_id}_{entity_description.key}"
+        self._attr_device_info = runtime.device_info
+
+    async def async_added_to_hass(self) -> None:
+        """Run when entity about to be added."""
+        self.async_on_remove(
+            self.hass.data[DOMAIN][DATA_HEALTH].async_add_listener(
+                self._runtime.device, self.async_write_ha_state
+            )
+        )
+        return await super().async_added_to_hass()
+
+    @property
+    def available(self) -> bool:
+        """Return whether the Domotica Box responds to health polls."""
+        return self._runtime.available
+
+    @profiled
+    async def async_press(self) -> None:
+        """Handle the button press."""
+        await self.entity_description.command_callback(self._runtime)
+
 
+class SceneGroupButton(ButtonEntity):
+    """Representation of a button dispatching a scene group to several boxes at once."""
+
+    _attr_icon = ICON_SCENE_GROUP
+
+    def __init__(
+        self,
+        runtime: MotionBlindsRS485Runtime,
+        name: str,
+        members: list[list[str | int]],
+        command: str,
+    ) -> None:
+        """Initialize the scene group button."""
+        _LOGGER.info(f"Setting up {name} {command} button")
+        self._members = members
+        self._command = command
+        self._last_result: GroupDispatchResult | None = None
+        self._attr_name = f"{name} {command}"
+        self._attr_unique_id = f"{runtime.unique_id}_group_{slugify(name)}_{command}"
+        self._attr_device_info = runtime.device_info
+
+    @property
+    @profiled
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the outcome of the last dispatch."""
+        if self._last_result is None:
+            return {}
+        return {
+            ATTR_SPREAD: round(self._last_result.spread * 1000, 1),
+            ATTR_FAILED: sorted(self._last_result.errors),
+            ATTR_QUEUED: sorted(self._last_result.queued),
+        }
+
+    @profiled
     async def async_press(self) -> None:
         """Handle the button press."""
-        await self.entity_description.command_callback(self._scene_select)
+        members = []
+        for hostname, scene in self._members:
+            if (runtime := get_runtime(self.hass, hostname)) is None:
+                raise HomeAssistantError(f"{hostname} is not set up")
+            members.append((runtime.device, scene))
+        scene_group = SceneGroup(members)
+        if self._command == ATTR_START:
+            self._last_result = await scene_group.start()
+        else:
+            self._last_result = await scene_group.stop()
+        self.async_write_ha_state()
+        if self._last_result.errors:
+            raise HomeAssistantError(
+                f"Failed to {self._command} scene on {', '.join(self._last_result.errors)}"
+            )
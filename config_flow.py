@@ -1,25 +1,117 @@
 """Config flow for MotionBlinds BLE integration."""
 from __future__ import annotations
 
+import asyncio
 import logging
+from typing import TYPE_CHECKING
+
+from aiohttp import ClientError
 
 from homeassistant.config_entries import (
     ConfigFlow,
     FlowResult,
     ConfigEntry,
+    ConfigEntryState,
     OptionsFlow,
 )
 from homeassistant.components.zeroconf import ZeroconfServiceInfo
-from homeassistant.core import callback
-from .const import DOMAIN, CONF_HOSTNAME, CONF_IP_ADDRESS, DISCOVERY_NAME, CONF_KEY
-
-from .select import SceneSelect
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.selector import TextSelector, TextSelectorConfig
+from .const import (
+    DOMAIN,
+    CONF_GROUP_MEMBERS,
+    CONF_GROUP_NAME,
+    CONF_HOSTNAME,
+    CONF_IP_ADDRESS,
+    CONF_SCENE_GROUPS,
+    DISCOVERY_NAME,
+    CONF_KEY,
+    CONF_MANIFEST,
+    CONF_NETWORK,
+    CONF_NETWORKS,
+    DEFAULT_PROVISIONING_WORKERS,
+)
+from .motionblinds_rs485.device import MotionBlindsRS485Device
+from .motionblinds_rs485.discovery import format_address
+from .motionblinds_rs485.exceptions import (
+    AdmissionTimeoutException,
+    NoAddressException,
+)
+from .motionblinds_rs485.keys import parse_keys
+from .motionblinds_rs485.provisioning import (
+    InvalidManifestException,
+    ManifestEntry,
+    parse_manifest,
+)
+from .provisioning import async_get_key_validator, async_provision, format_summary
+from .scanner import async_scan_networks
 
 import voluptuous as vol
 
+if TYPE_CHECKING:
+    from .runtime import MotionBlindsRS485ConfigEntry
+
 _LOGGER = logging.getLogger(__name__)
 
 STEP_USER_DATA_SCHEMA = vol.Schema({vol.Optional(CONF_KEY): str})
+STEP_MANIFEST_DATA_SCHEMA = vol.Schema(
+    {vol.Required(CONF_MANIFEST): TextSelector(TextSelectorConfig(multiline=True))}
+)
+STEP_SCAN_DATA_SCHEMA = vol.Schema(
+    {vol.Required(CONF_NETWORK): str, vol.Optional(CONF_KEY): str}
+)
+
+
+def parse_members(members: str) -> list[list[str | int]]:
+    """Parse "hostname:scene, hostname:scene" into [[hostname, scene], ...]."""
+    parsed = []
+    for member in members.split(","):
+        if member.strip() == "":
+            continue
+        hostname, _, scene = member.strip().rpartition(":")
+        if hostname == "" or not scene.isdigit() or not 1 <= int(scene) <= 15:
+            raise vol.Invalid(f"Invalid member {member.strip()}")
+        parsed.append([hostname, int(scene)])
+    return parsed
+
+
+def format_members(members: list[list[str | int]]) -> str:
+    return ", ".join(f"{hostname}:{scene}" for hostname, scene in members)
+
+
+def _probe_device(
+    hass: HomeAssistant, hostname: str, ip_address: str | None
+) -> MotionBlindsRS485Device:
+    device = MotionBlindsRS485Device(
+        f"{hostname}.local", use_ha=True, session=async_get_clientsession(hass)
+    )
+    if ip_address is not None:
+        device.set_ip_address(ip_address)
+    return device
+
+
+async def async_find_key(
+    hass: HomeAssistant, device: MotionBlindsRS485Device, keys: str
+) -> tuple[str | None, str | None]:
+    """Find the key the box accepts among comma separated candidates.
+
+    Returns the key, or the error to show in the form.
+    """
+    try:
+        key = await async_get_key_validator(hass).async_find_key(
+            device, parse_keys(keys)
+        )
+    except (
+        ClientError,
+        asyncio.TimeoutError,
+        AdmissionTimeoutException,
+        NoAddressException,
+    ):
+        return None, "cannot_connect"
+    if key is None:
+        return None, "invalid_key"
+    return key, None
 
 
 class FlowHandler(ConfigFlow, domain=DOMAIN):
@@ -60,22 +152,155 @@ class FlowHandler(ConfigFlow, domain=DOMAIN):
             if len(self._discovery_info.addresses) != 0
             else None
         )
+        errors: dict[str, str] = {}
         if user_input is not None:
-            return self.async_create_entry(
-                title=hostname,
-                data={
-                    CONF_HOSTNAME: hostname,
-                    CONF_IP_ADDRESS: ip_address,
-                    CONF_KEY: user_input[CONF_KEY] if CONF_KEY in user_input else "",
-                },
+            device = _probe_device(
+                self.hass,
+                hostname,
+                format_address(ip_address, self._discovery_info.port)
+                if ip_address is not None
+                else None,
             )
+            try:
+                key, error = await async_find_key(
+                    self.hass, device, user_input.get(CONF_KEY, "")
+                )
+            finally:
+                await device.close()
+            if error is None:
+                return self.async_create_entry(
+                    title=hostname,
+                    data={
+                        CONF_HOSTNAME: hostname,
+                        CONF_IP_ADDRESS: ip_address,
+                        CONF_KEY: key,
+                    },
+                )
+            errors[CONF_KEY] = error
 
         return self.async_show_form(
             step_id="confirm",
             data_schema=STEP_USER_DATA_SCHEMA,
+            errors=errors,
             description_placeholders={"display_name": hostname},
         )
 
+    async def async_step_user(
+        self, user_input: dict[str, any] | None = None
+    ) -> FlowResult:
+        """Choose between a manifest of Domotica Boxes and a subnet scan."""
+        return self.async_show_menu(step_id="user", menu_options=["manifest", "scan"])
+
+    async def async_step_manifest(
+        self, user_input: dict[str, any] | None = None
+    ) -> FlowResult:
+        """Add Domotica Boxes in bulk from a manifest of hostnames and keys."""
+        errors: dict[str, str] = {}
+        placeholders = {"error": ""}
+        if user_input is not None:
+            try:
+                entries = parse_manifest(user_input[CONF_MANIFEST])
+            except InvalidManifestException as exception:
+                errors[CONF_MANIFEST] = "invalid_manifest"
+                placeholders["error"] = str(exception)
+            else:
+                summary = await async_provision(
+                    self.hass, entries, DEFAULT_PROVISIONING_WORKERS
+                )
+                configured = sum(
+                    box["config_entry"] is not None for box in summary.values()
+                )
+                return self.async_abort(
+                    reason="provisioned",
+                    description_placeholders={
+                        "configured": str(configured),
+                        "total": str(len(summary)),
+                        "failed": format_summary(summary) or "-",
+                    },
+                )
+
+        return self.async_show_form(
+            step_id="manifest",
+            data_schema=STEP_MANIFEST_DATA_SCHEMA,
+            errors=errors,
+            description_placeholders=placeholders,
+        )
+
+    async def async_step_scan(
+        self, user_input: dict[str, any] | None = None
+    ) -> FlowResult:
+        """Add the Domotica Boxes found by scanning subnets mDNS does not reach."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            networks = [
+                network.strip()
+                for network in user_input[CONF_NETWORK].split(",")
+                if network.strip() != ""
+            ]
+            try:
+                results = await async_scan_networks(self.hass, networks)
+            except ValueError:
+                errors[CONF_NETWORK] = "invalid_network"
+            else:
+                if len(results) == 0:
+                    errors[CONF_NETWORK] = "no_boxes_found"
+            if not errors:
+                summary = await async_provision(
+                    self.hass,
+                    [
+                        ManifestEntry(
+                            result.hostname,
+                            user_input.get(CONF_KEY, ""),
+                            result.address,
+                        )
+                        for result in results
+                        if result.hostname is not None
+                    ],
+                    DEFAULT_PROVISIONING_WORKERS,
+                    networks,
+                )
+                configured = sum(
+                    box["config_entry"] is not None for box in summary.values()
+                )
+                # Without a hostname there is nothing to key an entry on
+                failed = [format_summary(summary)] + [
+                    f"{result.address}: No hostname"
+                    for result in results
+                    if result.hostname is None
+                ]
+                return self.async_abort(
+                    reason="provisioned",
+                    description_placeholders={
+                        "configured": str(configured),
+                        "total": str(len(results)),
+                        "failed": "\n".join(line for line in failed if line) or "-",
+                    },
+                )
+
+        return self.async_show_form(
+            step_id="scan",
+            data_schema=self.add_suggested_values_to_schema(
+                STEP_SCAN_DATA_SCHEMA, user_input
+            ),
+            errors=errors,
+        )
+
+    async def async_step_import(self, import_data: dict[str, any]) -> FlowResult:
+        """Create an entry for a box of a manifest, probed by async_provision."""
+        hostname = import_data[CONF_HOSTNAME]
+        await self.async_set_unique_id(hostname)
+        data = {
+            CONF_IP_ADDRESS: import_data[CONF_IP_ADDRESS],
+            CONF_KEY: import_data[CONF_KEY],
+        }
+        if CONF_NETWORKS in import_data:
+            # Found by a subnet scan
+            data[CONF_NETWORKS] = import_data[CONF_NETWORKS]
+        self._abort_if_unique_id_configured(updates=data)
+        return self.async_create_entry(
+            title=hostname, data={CONF_HOSTNAME: hostname, **data}
+        )
+
     @staticmethod
     @callback
     def async_get_options_flow(
@@ -86,9 +311,9 @@ class FlowHandler(ConfigFlow, domain=DOMAIN):
 
 
 class OptionsFlowHandler(OptionsFlow):
-    config_entry: ConfigEntry
+    config_entry: MotionBlindsRS485ConfigEntry
 
-    def __init__(self, config_entry: ConfigEntry) -> None:
+    def __init__(self, config_entry: MotionBlindsRS485ConfigEntry) -> None:
         """Initialize options flow."""
         self.config_entry = config_entry
 
@@ -96,21 +321,49 @@ class OptionsFlowHandler(OptionsFlow):
         self, user_input: dict[str, any] | None = None
     ) -> FlowResult:
         """Manage the options."""
-        scene_select: SceneSelect = self.hass.data[DOMAIN][self.config_entry.entry_id]
+        return self.async_show_menu(step_id="init", menu_options=["key", "scene_group"])
+
+    async def async_step_key(
+        self, user_input: dict[str, any] | None = None
+    ) -> FlowResult:
+        """Change the key."""
+        errors: dict[str, str] = {}
         if user_input is not None:
-            updated_data = {
-                **self.config_entry.data,
-                CONF_KEY: user_input[CONF_KEY],
-            }
-            self.hass.config_entries.async_update_entry(
-                self.config_entry,
-                data=updated_data,
+            loaded = self.config_entry.state is ConfigEntryState.LOADED
+            device = (
+                self.config_entry.runtime_data.device
+                if loaded
+                else _probe_device(
+                    self.hass,
+                    self.config_entry.data[CONF_HOSTNAME],
+                    self.config_entry.data.get(CONF_IP_ADDRESS),
+                )
             )
-            scene_select.set_key(user_input[CONF_KEY])
-            return self.async_create_entry(title="", data=user_input)
+            try:
+                key, error = await async_find_key(
+                    self.hass, device, user_input.get(CONF_KEY, "")
+                )
+            finally:
+                if not loaded:
+                    await device.close()
+            if error is None:
+                updated_data = {
+                    **self.config_entry.data,
+                    CONF_KEY: key,
+                }
+                self.hass.config_entries.async_update_entry(
+                    self.config_entry,
+                    data=updated_data,
+                )
+                if loaded:
+                    self.config_entry.runtime_data.set_key(key)
+                return self.async_create_entry(
+                    title="", data=dict(self.config_entry.options)
+                )
+            errors[CONF_KEY] = error
 
         return self.async_show_form(
-            step_id="init",
+            step_id="key",
             data_schema=vol.Schema(
                 {
                     vol.Optional(
@@ -119,4 +372,57 @@ class OptionsFlowHandler(OptionsFlow):
                     ): str
                 }
             ),
+            errors=errors,
+        )
+
+    async def async_step_scene_group(
+        self, user_input: dict[str, any] | None = None
+    ) -> FlowResult:
+        """Add, change or remove (no members) a scene group spanning several boxes."""
+        errors: dict[str, str] = {}
+        scene_groups: dict[str, list] = dict(
+            self.config_entry.options.get(CONF_SCENE_GROUPS, {})
+        )
+        if user_input is not None:
+            name = user_input[CONF_GROUP_NAME].strip()
+            known_hostnames = {
+                entry.data[CONF_HOSTNAME]
+                for entry in self.hass.config_entries.async_entries(DOMAIN)
+            }
+            try:
+                members = parse_members(user_input.get(CONF_GROUP_MEMBERS, ""))
+            except vol.Invalid:
+                errors[CONF_GROUP_MEMBERS] = "invalid_members"
+            else:
+                if any(hostname not in known_hostnames for hostname, _ in members):
+                    errors[CONF_GROUP_MEMBERS] = "unknown_box"
+            if not errors:
+                if len(members) == 0:
+                    scene_groups.pop(name, None)
+                else:
+                    scene_groups[name] = members
+                return self.async_create_entry(
+                    title="",
+                    data={
+                        **self.config_entry.options,
+                        CONF_SCENE_GROUPS: scene_groups,
+                    },
+                )
+
+        return self.async_show_form(
+            step_id="scene_group",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_GROUP_NAME): str,
+                    vol.Optional(CONF_GROUP_MEMBERS, default=""): str,
+                }
+            ),
+            errors=errors,
+            description_placeholders={
+                "scene_groups": "\n".join(
+                    f"{name}: {format_members(members)}"
+                    for name, members in scene_groups.items()
+                )
+                or "-"
+            },
         )
@@ -5,10 +5,48 @@ DOMAIN = "motionblinds_rs485"
 ATTR_START = "start"
 ATTR_STOP = "stop"
 ATTR_SCENE = "scene"
+ATTR_SCENES = "scenes"
+ATTR_MAX_CONCURRENCY = "max_concurrency"
+
+ATTR_LATENCY_P50 = "latency_p50"
+ATTR_LATENCY_P95 = "latency_p95"
+ATTR_QUEUE_WAIT_P95 = "queue_wait_p95"
+ATTR_TIMEOUTS = "timeouts"
+ATTR_CONNECTION_ERRORS = "connection_errors"
+ATTR_INVALID_KEY_ERRORS = "invalid_key_errors"
+ATTR_BUFFERED_COMMANDS = "buffered_commands"
+ATTR_DROPPED_COMMANDS = "dropped_commands"
+ATTR_LAST_CONTACT = "last_contact"
+ATTR_CIRCUIT_BREAKER = "circuit_breaker"
+ATTR_RUNNING_SCENES = "running_scenes"
+ATTR_SPREAD = "spread_ms"
+ATTR_FAILED = "failed"
+ATTR_QUEUED = "queued"
 
 CONF_HOSTNAME = "hostname"
 CONF_IP_ADDRESS = "ip_address"
 CONF_KEY = "key"
+CONF_SCENE_GROUPS = "scene_groups"
+CONF_GROUP_NAME = "name"
+CONF_GROUP_MEMBERS = "members"
+CONF_MANIFEST = "manifest"
+CONF_PATH = "path"
+CONF_FORMAT = "format"
+CONF_WORKERS = "workers"
+CONF_NETWORK = "network"
+# CIDR ranges a box was found in by a subnet scan, scanned again when it moves
+CONF_NETWORKS = "networks"
+CONF_CONCURRENCY = "concurrency"
+CONF_THRESHOLD = "threshold"
+
+DATA_DISCOVERY = "discovery"
+DATA_ENTITY_RUNTIMES = "entity_runtimes"
+DATA_ENTRY_WRITER = "entry_writer"
+DATA_HEALTH = "health"
+DATA_KEY_VALIDATOR = "key_validator"
+
+DISCOVERY_SERVICE_TYPE = "_http._tcp.local."
+DISCOVERY_NAME_FILTER = "motionblinds*"
 
 DISCOVERY_NAME = "Domotica Box {mac_code}"
 ENTITY_NAME = "Domotica Box {mac_code} scene"
@@ -16,8 +54,21 @@ ENTITY_NAME = "Domotica Box {mac_code} scene"
 ICON_START = "mdi:play"
 ICON_STOP = "mdi:stop"
 ICON_SCENE = "mdi:white-balance-sunny"
+ICON_SCENE_GROUP = "mdi:blinds-horizontal"
 
 MANUFACTURER = "MotionBlinds - Coulisse"
 
 SERVICE_START = "start"
 SERVICE_STOP = "stop"
+SERVICE_PROVISION = "provision"
+SERVICE_SCAN = "scan"
+SERVICE_START_PROFILING = "start_profiling"
+SERVICE_STOP_PROFILING = "stop_profiling"
+
+# Shared by the scene selects of all boxes
+SCENE_OPTIONS = tuple(str(scene) for scene in range(1, 16))
+
+DEFAULT_MAX_CONCURRENCY = 10
+DEFAULT_PROVISIONING_WORKERS = 16
+# Milliseconds the event loop may be held before it is reported
+DEFAULT_PROFILING_THRESHOLD = 50
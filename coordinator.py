@@ -0,0 +1,132 @@
+"""Health polling of Domotica Boxes for the MotionBlinds RS485 integration."""
+from __future__ import annotations
+
+import logging
+import random
+from collections.abc import Callable
+from datetime import datetime
+from functools import partial
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, HassJob, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+if TYPE_CHECKING:
+    from .motionblinds_rs485.device import MotionBlindsRS485Device
+
+_LOGGER = logging.getLogger(__name__)
+
+HEALTHY_INTERVAL = 60
+FAILURE_INTERVAL = 5
+# Well below the 300 s commands are kept in the offline buffer, so they are
+# sent before they expire
+MAX_FAILURE_INTERVAL = 120
+PING_TIMEOUT = 3
+
+
+class DeviceHealth:
+    """Availability and polling schedule of one box."""
+
+    __slots__ = ("available", "failures", "cancel_poll", "listeners")
+
+    def __init__(self) -> None:
+        self.available = True
+        self.failures = 0
+        self.cancel_poll: CALLBACK_TYPE | None = None
+        self.listeners: list[Callable[[], None]] = []
+
+    def interval(self, device: MotionBlindsRS485Device) -> float:
+        """Seconds until the next poll.
+
+        The first poll after a failure follows quickly, unreachable boxes are
+        then polled exponentially less often. While commands for the box are
+        buffered it is polled quickly, they are sent as soon as it is back.
+        """
+        if self.failures == 0:
+            return HEALTHY_INTERVAL
+        if device.offline_buffer is not None and device.offline_buffer.depth != 0:
+            return FAILURE_INTERVAL
+        return min(FAILURE_INTERVAL * 2 ** (self.failures - 1), MAX_FAILURE_INTERVAL)
+
+
+class MotionBlindsRS485HealthCoordinator:
+    """Poll all boxes with an adaptive interval and track their availability."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self._health: dict[MotionBlindsRS485Device, DeviceHealth] = {}
+
+    @callback
+    def async_add_device(self, device: MotionBlindsRS485Device) -> CALLBACK_TYPE:
+        """Start polling a device, returns a function to stop."""
+        health = self._health.setdefault(device, DeviceHealth())
+        # Spread the first polls so many boxes are not pinged at once
+        self._async_schedule(device, health, random.uniform(0, FAILURE_INTERVAL))
+
+        @callback
+        def _async_remove() -> None:
+            if (health := self._health.pop(device, None)) is not None:
+                if health.cancel_poll is not None:
+                    health.cancel_poll()
+
+        return _async_remove
+
+    @callback
+    def async_add_listener(
+        self, device: MotionBlindsRS485Device, listener: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Call listener when the availability of a device changes."""
+        health = self._health.setdefault(device, DeviceHealth())
+        health.listeners.append(listener)
+
+        @callback
+        def _async_remove() -> None:
+            if listener in health.listeners:
+                health.listeners.remove(listener)
+
+        return _async_remove
+
+    def is_available(self, device: MotionBlindsRS485Device) -> bool:
+        health = self._health.get(device)
+        return health is None or health.available
+
+    @callback
+    def _async_schedule(
+        self, device: MotionBlindsRS485Device, health: DeviceHealth, delay: float
+    ) -> None:
+        if health.cancel_poll is not None:
+            health.cancel_poll()
+        health.cancel_poll = async_call_later(
+            self.hass, delay, HassJob(partial(self._async_start_poll, device))
+        )
+
+    @callback
+    def _async_start_poll(self, device: MotionBlindsRS485Device, _now: datetime) -> None:
+        self.hass.async_create_background_task(
+            self._async_poll(device), f"motionblinds_rs485 ping {device.hostname}"
+        )
+
+    async def _async_poll(self, device: MotionBlindsRS485Device) -> None:
+        if (health := self._health.get(device)) is None:
+            return
+        health.cancel_poll = None
+        try:
+            available = await device.ping(timeout=PING_TIMEOUT)
+            if self._health.get(device) is not health:
+                # Removed while pinging
+                return
+            health.failures = 0 if available else health.failures + 1
+            if available != health.available:
+                _LOGGER.info(
+                    "%s is %s",
+                    device.hostname,
+                    "available" if available else "unavailable",
+                )
+                health.available = available
+                for listener in list(health.listeners):
+                    listener()
+        finally:
+            # Even after an unexpected error, otherwise the box is never
+            # polled again
+            if self._health.get(device) is health:
+                self._async_schedule(device, health, health.interval(device))
@@ -0,0 +1,42 @@
+"""Diagnostics support for the MotionBlinds RS485 integration."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_KEY
+from .motionblinds_rs485.admission import AdmissionController
+from .motionblinds_rs485.profiling import Profiler
+
+if TYPE_CHECKING:
+    from .runtime import MotionBlindsRS485ConfigEntry
+
+TO_REDACT = {CONF_KEY}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: MotionBlindsRS485ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    device = entry.runtime_data.device
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "device": {
+            "ip_address": device.ip_address,
+            "supports_batch": device.supports_batch,
+            "coalesced_commands": device.coalesced_commands,
+            "superseded_commands": device.superseded_commands,
+            "push_supported": device.push.supported,
+            "push_transport": device.push.transport,
+            "push_connected": device.push.connected,
+            "transport": device.transport.as_dict(),
+        },
+        "metrics": device.metrics.as_dict(),
+        "offline_buffer": device.offline_buffer.as_dict()
+        if device.offline_buffer is not None
+        else None,
+        "admission": AdmissionController.shared().as_dict(),
+        "profiler": Profiler.shared().report(),
+    }
@@ -0,0 +1,104 @@
+"""Shared zeroconf discovery for the MotionBlinds RS485 integration."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+from fnmatch import fnmatch
+
+from homeassistant.components.zeroconf import (
+    HaAsyncServiceBrowser,
+    HaZeroconf,
+    async_get_instance,
+)
+from homeassistant.core import HomeAssistant, callback
+from zeroconf import ServiceStateChange
+from zeroconf.asyncio import AsyncServiceInfo
+
+from .const import DATA_DISCOVERY, DISCOVERY_NAME_FILTER, DISCOVERY_SERVICE_TYPE, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DiscoveryCallback = Callable[[AsyncServiceInfo], None]
+
+
+class MotionBlindsRS485Discovery:
+    """One zeroconf browser for all Domotica Boxes, dispatching by hostname."""
+
+    zeroconf: HaZeroconf
+    browser: HaAsyncServiceBrowser | None = None
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self._callbacks: dict[str, DiscoveryCallback] = {}
+
+    async def async_start(self) -> None:
+        """Start browsing for Domotica Boxes."""
+        self.zeroconf = await async_get_instance(self.hass)
+        self.browser = HaAsyncServiceBrowser(
+            False,
+            self.zeroconf,
+            [DISCOVERY_SERVICE_TYPE],
+            handlers=[self.async_service_update],
+        )
+
+    async def async_stop(self) -> None:
+        """Cancel the browser."""
+        if self.browser is not None:
+            await self.browser.async_cancel()
+            self.browser = None
+
+    @callback
+    def async_register(
+        self, hostname: str, discovery_callback: DiscoveryCallback
+    ) -> Callable[[], None]:
+        """Register a callback for a hostname, returns a function to unregister."""
+        self._callbacks[hostname.lower()] = discovery_callback
+
+        @callback
+        def _async_unregister() -> None:
+            self._callbacks.pop(hostname.lower(), None)
+
+        return _async_unregister
+
+    @property
+    def registered(self) -> int:
+        """Number of hostnames with a registered callback."""
+        return len(self._callbacks)
+
+    @callback
+    def async_service_update(
+        self,
+        zeroconf: HaZeroconf,
+        service_type: str,
+        name: str,
+        state_change: ServiceStateChange,
+    ) -> None:
+        if state_change is ServiceStateChange.Removed:
+            return
+        # motionblinds-rs485-D4D4DA8512FC._http._tcp.local.
+        instance_name = name.removesuffix(f".{service_type}").lower()
+        if not fnmatch(instance_name, DISCOVERY_NAME_FILTER):
+            return
+        if (discovery_callback := self._callbacks.get(instance_name)) is None:
+            return
+        async_service_info = AsyncServiceInfo(service_type, name)
+        async_service_info.load_from_cache(self.zeroconf)
+        discovery_callback(async_service_info)
+
+
+async def async_get_discovery(hass: HomeAssistant) -> MotionBlindsRS485Discovery:
+    """Get the shared discovery, starting it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (discovery := domain_data.get(DATA_DISCOVERY)) is None:
+        discovery = domain_data[DATA_DISCOVERY] = MotionBlindsRS485Discovery(hass)
+        await discovery.async_start()
+    return discovery
+
+
+async def async_release_discovery(hass: HomeAssistant) -> None:
+    """Stop the shared discovery once no hostnames are registered anymore."""
+    domain_data = hass.data.get(DOMAIN, {})
+    discovery: MotionBlindsRS485Discovery | None = domain_data.get(DATA_DISCOVERY)
+    if discovery is not None and discovery.registered == 0:
+        domain_data.pop(DATA_DISCOVERY)
+        await discovery.async_stop()
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import weakref
+from collections import deque
+from typing import Any
+
+from .metrics import LatencyHistogram
+
+# The ESP32 only handles a few sockets at once
+DEFAULT_PER_BOX_LIMIT = 2
+# Requests per second and burst of the token bucket of each box
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 5
+# Sockets open to all boxes together
+DEFAULT_GLOBAL_LIMIT = 64
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "_updated")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def delay(self) -> float:
+        """Seconds until a token is available."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class BoxAdmission:
+    """Admission state of one box, acquire() before and release() after a request."""
+
+    __slots__ = (
+        "_controller",
+        "in_flight",
+        "reserved",
+        "_bucket",
+        "_waiters",
+        "__weakref__",
+    )
+
+    def __init__(self, controller: AdmissionController) -> None:
+        self._controller = controller
+        self.in_flight = 0
+        # Slots held by long-lived connections, see reserve()
+        self.reserved = 0
+        self._bucket = (
+            TokenBucket(controller.rate, controller.burst)
+            if controller.rate is not None
+            else None
+        )
+        # Never longer than the requests queued for this box, a list is
+        # smaller than a deque
+        self._waiters: list[asyncio.Future] = []
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def limit(self) -> int:
+        return self._controller.per_box_limit
+
+    @property
+    def has_free_slot(self) -> bool:
+        return self.in_flight + self.reserved < self.limit
+
+    def _can_admit(self) -> bool:
+        return self.has_free_slot and (
+            self._bucket is None or self._bucket.try_take()
+        )
+
+    def _token_delay(self) -> float:
+        return self._bucket.delay() if self._bucket is not None else 0.0
+
+    async def acquire(self) -> float:
+        """Wait until the request may be sent, returns the seconds waited."""
+        controller = self._controller
+        if (
+            len(self._waiters) == 0
+            and controller.in_flight < controller.global_limit
+            and self._can_admit()
+        ):
+            controller._admit(self)
+            controller.wait_time.record(0.0)
+            return 0.0
+        start_time = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        controller._enqueue(self)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just before being cancelled
+                self.release()
+            elif future in self._waiters:
+                self._waiters.remove(future)
+            raise
+        waited = time.monotonic() - start_time
+        controller.wait_time.record(waited)
+        return waited
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._controller._release()
+
+    async def reserve(self) -> float:
+        """Wait for a slot and hold it until unreserve(), returns the seconds waited.
+
+        For a long-lived connection, e.g. the push channel: it is one of the
+        few sockets of the box for as long as it is open, so requests get one
+        slot less. It does not count against the global limit, which is
+        about requests in flight.
+        """
+        waited = await self.acquire()
+        self.in_flight -= 1
+        self.reserved += 1
+        self._controller._release()
+        return waited
+
+    def unreserve(self) -> None:
+        self.reserved -= 1
+        self._controller._dispatch()
+
+
+class AdmissionController:
+    """Limits requests per box and over all boxes, queueing the excess.
+
+    Each box has an in-flight limit and a token bucket, all boxes share a
+    global budget. Queued requests are admitted round-robin over the boxes,
+    so one busy box cannot starve the others. Nothing fails, requests only
+    wait.
+    """
+
+    _shared: AdmissionController | None = None
+
+    def __init__(
+        self,
+        global_limit: int = DEFAULT_GLOBAL_LIMIT,
+        per_box_limit: int = DEFAULT_PER_BOX_LIMIT,
+        rate: float | None = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+    ) -> None:
+        self.global_limit = global_limit
+        self.per_box_limit = per_box_limit
+        # None disables the token buckets
+        self.rate = rate
+        self.burst = burst
+        self.in_flight = 0
+        self.admitted = 0
+        self.wait_time = LatencyHistogram()
+        # Devices of the same box share its limits, kept as long as a device
+        # holds them
+        self._boxes: weakref.WeakValueDictionary[str, BoxAdmission] = (
+            weakref.WeakValueDictionary()
+        )
+        # Boxes with queued requests, in round-robin order
+        self._ring: deque[BoxAdmission] = deque()
+        self._timer: asyncio.TimerHandle | None = None
+
+    @classmethod
+    def shared(cls) -> AdmissionController:
+        """Get the controller shared by all devices in the process."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def box(self, hostname: str) -> BoxAdmission:
+        """Get the admission state of a box, shared by all its devices."""
+        if (box := self._boxes.get(hostname)) is None:
+            box = self._boxes[hostname] = BoxAdmission(self)
+        return box
+
+    @property
+    def waiting(self) -> int:
+        return sum(box.waiting for box in self._ring)
+
+    def _admit(self, box: BoxAdmission) -> None:
+        box.in_flight += 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    def _enqueue(self, box: BoxAdmission) -> None:
+        if box not in self._ring:
+            self._ring.append(box)
+        self._dispatch()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # One request per box per round
+        admitted = True
+        while admitted and self.in_flight < self.global_limit and self._ring:
+            admitted = False
+            for _ in range(len(self._ring)):
+                if self.in_flight >= self.global_limit:
+                    break
+                box = self._ring.popleft()
+                while box._waiters and box._waiters[0].done():
+                    # Cancelled while waiting
+                    box._waiters.pop(0)
+                if box._waiters and box._can_admit():
+                    self._admit(box)
+                    box._waiters.pop(0).set_result(None)
+                    admitted = True
+                if box._waiters:
+                    self._ring.append(box)
+        if self._ring and self.in_flight < self.global_limit:
+            # Only waiting for tokens (or in flight requests), look again when
+            # the first bucket refills
+            delays = [box._token_delay() for box in self._ring if box.has_free_slot]
+            if delays:
+                self._timer = asyncio.get_running_loop().call_later(
+                    max(min(delays), 0.001), self._dispatch
+                )
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "global_limit": self.global_limit,
+            "per_box_limit": self.per_box_limit,
+            "rate": self.rate,
+            "burst": self.burst,
+            "in_flight": self.in_flight,
+            "reserved": sum(box.reserved for box in self._boxes.values()),
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "wait_time": self.wait_time.as_dict(),
+        }
@@ -0,0 +1,455 @@
+"""Benchmarks of MotionBlindsRS485Device against the local simulator.
+
+Run with:
+python -m motionblinds_rs485.benchmark
+    [batch|latency|throughput|discovery|construction|memory|admission|serial|scan]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Sequence
+
+from aiohttp import ClientSession
+from zeroconf import IPVersion
+from zeroconf.asyncio import AsyncZeroconf
+
+from .admission import AdmissionController
+from .device import MotionBlindsRS485Device
+from .discovery import MotionBlindsRS485Discovery
+from .offline import OfflineBuffer
+from .simulator import MotionBlindsRS485Simulator, SerialBusSimulator
+from .scanner import async_scan
+from .transport import SerialTransport, serial_hostname
+
+LATENCY = 0.02
+SCENES = (1, 2, 3, 4, 5)
+SCENARIOS = (
+    "batch",
+    "latency",
+    "throughput",
+    "discovery",
+    "construction",
+    "memory",
+    "admission",
+    "serial",
+    "scan",
+)
+DEVICE_COUNTS = (10, 100, 1000)
+
+
+# Only the per box in-flight limit, the other scenarios measure the device
+# and not the rate limits
+UNTHROTTLED = AdmissionController(global_limit=1_000_000, rate=None)
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """Nearest-rank percentile of values."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _device_for(simulator: MotionBlindsRS485Simulator) -> MotionBlindsRS485Device:
+    # use_ha leaves discovery out, the address is known
+    device = MotionBlindsRS485Device(
+        f"{simulator.hostname}.local", use_ha=True, admission=UNTHROTTLED
+    )
+    device.set_ip_address(simulator.address, ttl=3600)
+    return device
+
+
+async def _start_boxes(count: int, **kwargs) -> list[MotionBlindsRS485Simulator]:
+    simulators = [
+        MotionBlindsRS485Simulator(hostname=f"motionblinds-rs485-{index:012X}", **kwargs)
+        for index in range(count)
+    ]
+    await asyncio.gather(*(simulator.start() for simulator in simulators))
+    return simulators
+
+
+async def benchmark_batch(scenes=SCENES, latency=LATENCY) -> dict[str, float]:
+    """Time starting several scenes one by one, pipelined and batched."""
+    results: dict[str, float] = {}
+    for name, batch in (("sequential", False), ("pipelined", False), ("batched", True)):
+        simulator = MotionBlindsRS485Simulator(latency=latency, batch=batch)
+        await simulator.start()
+        device = await _device_for(simulator)
+        # Feature detection and connection setup are not part of the timing
+        await device.ping()
+        device.supports_batch = batch
+        start_time = time.perf_counter()
+        if name == "sequential":
+            for scene in scenes:
+                await device.start(scene)
+        else:
+            await device.start_many(scenes)
+        results[name] = time.perf_counter() - start_time
+        await device.close()
+        await simulator.stop()
+    return results
+
+
+async def benchmark_latency(
+    commands: int = 200, latency: float = 0.0, error_rate: float = 0.0
+) -> dict[str, float]:
+    """Latency percentiles of consecutive commands to one box."""
+    (simulator,) = await _start_boxes(1, latency=latency, error_rate=error_rate)
+    device = await _device_for(simulator)
+    durations: list[float] = []
+    errors = 0
+    for index in range(commands):
+        start_time = time.perf_counter()
+        try:
+            await device.start(index % 15 + 1)
+        except Exception:  # pylint: disable=broad-except
+            errors += 1
+        durations.append(time.perf_counter() - start_time)
+    await device.close()
+    await simulator.stop()
+    return {
+        "p50": percentile(durations, 50),
+        "p90": percentile(durations, 90),
+        "p99": percentile(durations, 99),
+        "max": max(durations),
+        "errors": errors,
+    }
+
+
+async def benchmark_throughput(
+    boxes: int = 20,
+    commands: int = 50,
+    latency: float = LATENCY,
+    error_rate: float = 0.0,
+) -> dict[str, float]:
+    """Commands per second when commanding all boxes at the same time."""
+    simulators = await _start_boxes(boxes, latency=latency, error_rate=error_rate)
+    devices = [await _device_for(simulator) for simulator in simulators]
+    errors = 0
+
+    async def run(device: MotionBlindsRS485Device) -> None:
+        nonlocal errors
+        for index in range(commands):
+            try:
+                await device.start(index % 15 + 1)
+            except Exception:  # pylint: disable=broad-except
+                errors += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(run(device) for device in devices))
+    duration = time.perf_counter() - start_time
+    await asyncio.gather(*(device.close() for device in devices))
+    await asyncio.gather(*(simulator.stop() for simulator in simulators))
+    return {
+        "commands": boxes * commands,
+        "duration": duration,
+        "commands_per_second": boxes * commands / duration,
+        "errors": errors,
+    }
+
+
+async def benchmark_discovery(boxes: int = 5, timeout: float = 10) -> dict[str, float]:
+    """Time until the addresses of boxes advertised on loopback are known."""
+    simulators = await _start_boxes(boxes)
+    for simulator in simulators:
+        await simulator.advertise()
+    discovery = MotionBlindsRS485Discovery.shared(
+        AsyncZeroconf(interfaces=["127.0.0.1"], ip_version=IPVersion.V4Only)
+    )
+    aiozc = discovery.aiozc
+    devices = [
+        MotionBlindsRS485Device(f"{simulator.hostname}.local")
+        for simulator in simulators
+    ]
+    start_time = time.perf_counter()
+    found: list[float] = []
+
+    async def wait(device: MotionBlindsRS485Device) -> None:
+        await device.wait_for_address(timeout)
+        found.append(time.perf_counter() - start_time)
+
+    results = await asyncio.gather(
+        *(wait(device) for device in devices), return_exceptions=True
+    )
+    await asyncio.gather(*(device.close() for device in devices))
+    await aiozc.async_close()
+    await asyncio.gather(*(simulator.stop() for simulator in simulators))
+    return {
+        "first": min(found, default=float("nan")),
+        "all": max(found, default=float("nan")),
+        "missed": sum(isinstance(result, Exception) for result in results),
+    }
+
+
+def benchmark_import() -> float:
+    """Seconds to import the device module in a fresh interpreter."""
+    start_time = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", f"import {__package__}.device"], check=True
+    )
+    baseline_start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    baseline = time.perf_counter() - baseline_start
+    return baseline_start - start_time - baseline
+
+
+async def benchmark_construction(
+    counts: Sequence[int] = DEVICE_COUNTS,
+) -> dict[str, float]:
+    """Import time of the library and per box cost of building devices.
+
+    Devices are built like the integration builds them, with a shared
+    session, an offline buffer and a stored address. This is only the
+    library part of setting up a config entry, NOT the setup cost per config
+    entry: async_setup_entry needs a running Home Assistant, which these
+    benchmarks do not have, so its own work (forwarding the platforms,
+    entities, the health coordinator) is not measured at all.
+    """
+    results: dict[str, float] = {"import": benchmark_import()}
+    async with ClientSession() as session:
+        for count in counts:
+            start_time = time.perf_counter()
+            devices = [
+                MotionBlindsRS485Device(
+                    f"motionblinds-rs485-{index:012X}.local",
+                    use_ha=True,
+                    session=session,
+                    admission=UNTHROTTLED,
+                    offline_buffer=OfflineBuffer(),
+                )
+                for index in range(count)
+            ]
+            for index, device in enumerate(devices):
+                device.set_ip_address(f"127.0.0.1:{index + 1}", ttl=0)
+            results[f"per_box_{count}"] = (time.perf_counter() - start_time) / count
+            await asyncio.gather(*(device.close() for device in devices))
+    return results
+
+
+async def benchmark_memory(counts: Sequence[int] = DEVICE_COUNTS) -> dict[str, int]:
+    """Bytes allocated per device after it talked to a simulated box once."""
+    (simulator,) = await _start_boxes(1)
+    results: dict[str, int] = {}
+    async with ClientSession() as session:
+        # The connection to the simulator is not part of the measurement
+        await session.get(f"http://{simulator.address}/")
+        for count in counts:
+            gc.collect()
+            tracemalloc.start()
+            devices = [
+                MotionBlindsRS485Device(
+                    f"motionblinds-rs485-{index:012X}.local",
+                    use_ha=True,
+                    session=session,
+                    admission=UNTHROTTLED,
+                    offline_buffer=OfflineBuffer(),
+                )
+                for index in range(count)
+            ]
+            for device in devices:
+                device.set_ip_address(simulator.address, ttl=3600)
+                await device.ping()
+            gc.collect()
+            allocated = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            results[f"bytes_per_box_{count}"] = round(allocated / count)
+            await asyncio.gather(*(device.close() for device in devices))
+    await simulator.stop()
+    return results
+
+
+async def benchmark_admission(
+    boxes: int = 20,
+    clients: int = 4,
+    commands: int = 10,
+    latency: float = LATENCY,
+    global_limit: int = 16,
+) -> dict[str, dict[str, float]]:
+    """Several clients per box commanding boxes that drop a third connection.
+
+    Compares the default per box limits and a global budget with no
+    admission control at all.
+    """
+    results: dict[str, dict[str, float]] = {}
+    for name, admission in (
+        ("admitted", AdmissionController(global_limit=global_limit)),
+        (
+            "unlimited",
+            AdmissionController(
+                global_limit=1_000_000, per_box_limit=1_000_000, rate=None
+            ),
+        ),
+    ):
+        simulators = await _start_boxes(boxes, latency=latency, max_connections=2)
+        async with ClientSession() as session:
+            # Like several automations each with their own device
+            devices = []
+            for simulator in simulators:
+                for _ in range(clients):
+                    device = MotionBlindsRS485Device(
+                        f"{simulator.hostname}.local",
+                        use_ha=True,
+                        session=session,
+                        admission=admission,
+                    )
+                    device.set_ip_address(simulator.address, ttl=3600)
+                    devices.append(device)
+            errors = 0
+
+            async def run(device: MotionBlindsRS485Device) -> None:
+                nonlocal errors
+                for index in range(commands):
+                    try:
+                        await device.start(index % 15 + 1)
+                    except Exception:  # pylint: disable=broad-except
+                        errors += 1
+
+            start_time = time.perf_counter()
+            await asyncio.gather(*(run(device) for device in devices))
+            duration = time.perf_counter() - start_time
+            await asyncio.gather(*(device.close() for device in devices))
+        await asyncio.gather(*(simulator.stop() for simulator in simulators))
+        results[name] = {
+            "duration": duration,
+            "rejected": sum(simulator.rejected for simulator in simulators),
+            "errors": errors,
+            "wait_p50": admission.wait_time.percentile(50),
+            "wait_p95": admission.wait_time.percentile(95),
+        }
+    return results
+
+
+async def benchmark_serial(commands: int = 200) -> dict[str, float]:
+    """Latency percentiles of consecutive commands written to a serial port.
+
+    Only the cost of the library's write path: the port is a pseudo-terminal
+    parsing the same assumed frames, so this says nothing about real motors,
+    and the time to put the bytes on a bus (about 1ms per byte at 9600 baud)
+    is not included.
+    """
+    bus = SerialBusSimulator()
+    port = await bus.start()
+    device = MotionBlindsRS485Device(
+        serial_hostname(port),
+        use_ha=True,
+        transport=SerialTransport(port, unverified_frames=True),
+    )
+    # Opening the port is not part of the timing
+    await device.ping()
+    durations: list[float] = []
+    errors = 0
+    for index in range(commands):
+        start_time = time.perf_counter()
+        try:
+            await device.start(index % 15 + 1)
+        except Exception:  # pylint: disable=broad-except
+            errors += 1
+        durations.append(time.perf_counter() - start_time)
+    await bus.wait_for(commands - errors)
+    await device.close()
+    await bus.stop()
+    return {
+        "p50": percentile(durations, 50),
+        "p90": percentile(durations, 90),
+        "p99": percentile(durations, 99),
+        "max": max(durations),
+        "errors": errors,
+    }
+
+
+async def benchmark_scan(
+    boxes: int = 5, network: str = "127.0.0.0/22"
+) -> dict[str, float]:
+    """Time scanning a subnet with a few boxes in it.
+
+    All boxes listen on the same port of their own loopback address, the
+    other addresses refuse the connection right away. On a real network they
+    mostly time out, which takes at most connect_timeout per round of
+    concurrency addresses.
+    """
+    simulators = [MotionBlindsRS485Simulator(host="127.0.1.1")]
+    await simulators[0].start()
+    for index in range(1, boxes):
+        simulators.append(
+            MotionBlindsRS485Simulator(
+                host=f"127.0.1.{index + 1}",
+                port=simulators[0].port,
+                hostname=f"motionblinds-rs485-{index:012X}",
+            )
+        )
+    await asyncio.gather(*(simulator.start() for simulator in simulators[1:]))
+    start_time = time.perf_counter()
+    results = await async_scan(network, port=simulators[0].port)
+    duration = time.perf_counter() - start_time
+    await asyncio.gather(*(simulator.stop() for simulator in simulators))
+    return {"duration": duration, "found": len(results), "boxes": boxes}
+
+
+def _print(name: str, results: dict[str, float]) -> None:
+    parts = []
+    for key, value in results.items():
+        if key.endswith("_per_second"):
+            parts.append(f"{key}={value:.0f}")
+        elif key.startswith("per_box"):
+            parts.append(f"{key}={value * 1e6:.1f}us")
+        elif isinstance(value, float):
+            parts.append(f"{key}={value * 1000:.1f}ms")
+        else:
+            parts.append(f"{key}={value}")
+    print(f"{name}: {', '.join(parts)}")
+
+
+async def main(arguments: argparse.Namespace) -> None:
+    scenarios = arguments.scenarios or SCENARIOS
+    if "batch" in scenarios:
+        _print("batch", await benchmark_batch(latency=arguments.latency))
+    if "latency" in scenarios:
+        _print(
+            "latency",
+            await benchmark_latency(
+                arguments.commands, arguments.latency, arguments.error_rate
+            ),
+        )
+    if "throughput" in scenarios:
+        _print(
+            "throughput",
+            await benchmark_throughput(
+                arguments.boxes,
+                arguments.commands,
+                arguments.latency,
+                arguments.error_rate,
+            ),
+        )
+    if "discovery" in scenarios:
+        _print("discovery", await benchmark_discovery(min(arguments.boxes, 10)))
+    if "construction" in scenarios:
+        _print("construction", await benchmark_construction())
+    if "memory" in scenarios:
+        _print("memory", await benchmark_memory())
+    if "admission" in scenarios:
+        for name, results in (
+            await benchmark_admission(latency=arguments.latency)
+        ).items():
+            _print(f"admission {name}", results)
+    if "serial" in scenarios:
+        _print("serial", await benchmark_serial(arguments.commands))
+    if "scan" in scenarios:
+        _print("scan", await benchmark_scan())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help=", ".join(SCENARIOS))
+    parser.add_argument("--boxes", type=int, default=20)
+    parser.add_argument("--commands", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    arguments = parser.parse_args()
+    if unknown := set(arguments.scenarios) - set(SCENARIOS):
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    asyncio.run(main(arguments))
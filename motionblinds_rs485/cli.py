@@ -0,0 +1,279 @@
+"""Command line tool for fleets of Domotica Boxes, printing JSON lines.
+
+Run with: python -m motionblinds_rs485 {discover|ping|start|stop} ...
+
+Without --host, --address or --manifest the boxes are discovered first, over
+mDNS or by scanning the --network ranges where mDNS does not reach.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from typing import Any
+
+from aiohttp import ClientSession, TCPConnector
+from zeroconf import IPVersion
+from zeroconf.asyncio import AsyncZeroconf
+
+from .device import MotionBlindsRS485Device
+from .discovery import MotionBlindsRS485Discovery
+from .provisioning import ManifestEntry, canonical_hostname, parse_manifest
+from .scanner import DEFAULT_CONCURRENCY as DEFAULT_SCAN_CONCURRENCY
+from .scanner import ScanResult, async_scan
+
+COMMANDS = ("discover", "ping", "start", "stop")
+DEFAULT_DISCOVERY_TIMEOUT = 5.0
+DEFAULT_CONCURRENCY = 32
+
+
+def emit(**data: Any) -> None:
+    print(json.dumps(data), flush=True)
+
+
+async def discover(
+    timeout: float, interface: str | None = None, expect: int | None = None
+) -> list[ManifestEntry]:
+    """Boxes announcing themselves within timeout seconds, or until expect are found."""
+    discovery = MotionBlindsRS485Discovery(
+        AsyncZeroconf(interfaces=[interface], ip_version=IPVersion.V4Only)
+        if interface is not None
+        else None
+    )
+    found: dict[str, ManifestEntry] = {}
+    done = asyncio.Event()
+    start_time = time.perf_counter()
+
+    def on_discovered(hostname: str, ip_address: str) -> None:
+        hostname = canonical_hostname(hostname)
+        if hostname in found:
+            return
+        found[hostname] = ManifestEntry(hostname, ip_address=ip_address)
+        emit(
+            event="discovered",
+            hostname=hostname,
+            address=ip_address,
+            elapsed_ms=round((time.perf_counter() - start_time) * 1000, 1),
+        )
+        if expect is not None and len(found) >= expect:
+            done.set()
+
+    discovery.add_listener(on_discovered)
+    await discovery.async_start()
+    try:
+        await asyncio.wait_for(done.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await discovery.async_stop()
+        if discovery.aiozc is not None:
+            await discovery.aiozc.async_close()
+    return list(found.values())
+
+
+async def scan(networks: list[str], concurrency: int) -> list[ManifestEntry]:
+    """Boxes answering in the CIDR ranges of networks."""
+    start_time = time.perf_counter()
+
+    def on_found(result: ScanResult) -> None:
+        emit(
+            event="discovered",
+            hostname=result.hostname,
+            address=result.address,
+            elapsed_ms=round((time.perf_counter() - start_time) * 1000, 1),
+        )
+
+    results = await async_scan(networks, concurrency=concurrency, on_found=on_found)
+    return [
+        # Without a hostname the address stands in for it
+        ManifestEntry(result.hostname or result.address, ip_address=result.address)
+        for result in results
+    ]
+
+
+async def run_command(
+    command: str,
+    targets: list[ManifestEntry],
+    scenes: list[int],
+    concurrency: int,
+    repeat: int = 1,
+    timeout: float = 3,
+) -> int:
+    """Run command on all targets, at most concurrency boxes at a time.
+
+    Returns the number of failures.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+    durations: list[float] = []
+    # The ESP32 handles few sockets, keep at most two per box
+    async with ClientSession(
+        connector=TCPConnector(limit=concurrency * 2, limit_per_host=2)
+    ) as session:
+        devices = []
+        for target in targets:
+            device = MotionBlindsRS485Device(
+                f"{target.hostname}.local",
+                key=target.key,
+                use_ha=True,
+                session=session,
+            )
+            if target.ip_address is not None:
+                device.set_ip_address(target.ip_address, ttl=math.inf)
+            devices.append(device)
+
+        async def run(target: ManifestEntry, device: MotionBlindsRS485Device) -> None:
+            nonlocal failures
+            for _ in range(repeat):
+                async with semaphore:
+                    start_time = time.perf_counter()
+                    result: dict[str, Any] = {"ok": True}
+                    try:
+                        if command == "ping":
+                            result["ok"] = await device.ping(timeout=timeout)
+                            result["supports_batch"] = device.supports_batch
+                        elif command == "start":
+                            await device.start_many(scenes)
+                        else:
+                            await device.stop_many(scenes)
+                    except Exception as exception:  # pylint: disable=broad-except
+                        result = {
+                            "ok": False,
+                            "error": str(exception) or type(exception).__name__,
+                        }
+                    duration = time.perf_counter() - start_time
+                durations.append(duration)
+                failures += not result["ok"]
+                emit(
+                    event=command,
+                    hostname=target.hostname,
+                    address=device.ip_address,
+                    duration_ms=round(duration * 1000, 1),
+                    **result,
+                )
+
+        start_time = time.perf_counter()
+        await asyncio.gather(
+            *(run(target, device) for target, device in zip(targets, devices))
+        )
+        elapsed = time.perf_counter() - start_time
+        await asyncio.gather(*(device.close() for device in devices))
+    durations.sort()
+    emit(
+        event="summary",
+        command=command,
+        boxes=len(targets),
+        requests=len(durations),
+        failures=failures,
+        elapsed_ms=round(elapsed * 1000, 1),
+        p50_ms=round(durations[len(durations) // 2] * 1000, 1) if durations else None,
+        max_ms=round(durations[-1] * 1000, 1) if durations else None,
+    )
+    return failures
+
+
+def _targets(arguments: argparse.Namespace) -> list[ManifestEntry]:
+    targets: list[ManifestEntry] = []
+    if arguments.manifest is not None:
+        with open(arguments.manifest, encoding="utf-8") as manifest:
+            targets.extend(
+                parse_manifest(
+                    manifest.read(),
+                    "csv" if arguments.manifest.lower().endswith(".csv") else None,
+                )
+            )
+    targets.extend(
+        ManifestEntry(canonical_hostname(hostname), arguments.key)
+        for hostname in arguments.host
+    )
+    # Straight to an address, e.g. the simulator at 127.0.0.1:8080
+    targets.extend(
+        ManifestEntry(address, arguments.key, address) for address in arguments.address
+    )
+    return targets
+
+
+async def main(arguments: argparse.Namespace) -> int:
+    if arguments.command in ("start", "stop") and len(arguments.scenes) == 0:
+        raise SystemExit(f"{arguments.command} needs at least one scene")
+    targets = _targets(arguments)
+    if arguments.command == "discover" or len(targets) == 0:
+        if arguments.network:
+            try:
+                discovered = await scan(arguments.network, arguments.scan_concurrency)
+            except ValueError as exception:
+                raise SystemExit(str(exception)) from exception
+        else:
+            discovered = await discover(
+                arguments.discovery_timeout, arguments.interface, arguments.expect
+            )
+        if arguments.command == "discover":
+            emit(event="summary", command="discover", boxes=len(discovered))
+            return 0
+        targets = [
+            ManifestEntry(target.hostname, arguments.key, target.ip_address)
+            for target in discovered
+        ]
+    failures = await run_command(
+        arguments.command,
+        targets,
+        arguments.scenes,
+        arguments.concurrency,
+        arguments.repeat,
+        arguments.timeout,
+    )
+    return 1 if failures else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m motionblinds_rs485", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("scenes", nargs="*", type=int, help="scenes for start/stop")
+    parser.add_argument(
+        "--host", action="append", default=[], help="hostname of a box, repeatable"
+    )
+    parser.add_argument(
+        "--address",
+        action="append",
+        default=[],
+        help="IP address[:port] of a box, repeatable",
+    )
+    parser.add_argument("--manifest", help="YAML or CSV manifest of boxes")
+    parser.add_argument("--key", default="", help="key for boxes without one")
+    parser.add_argument(
+        "--discovery-timeout", type=float, default=DEFAULT_DISCOVERY_TIMEOUT
+    )
+    parser.add_argument("--expect", type=int, help="stop discovering after this many")
+    parser.add_argument("--interface", help="only discover on this interface address")
+    parser.add_argument(
+        "--network",
+        action="append",
+        default=[],
+        help="discover by scanning this CIDR range instead of mDNS, repeatable",
+    )
+    parser.add_argument(
+        "--scan-concurrency",
+        type=int,
+        default=DEFAULT_SCAN_CONCURRENCY,
+        help="addresses scanned at the same time",
+    )
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--repeat", type=int, default=1, help="commands per box")
+    parser.add_argument("--timeout", type=float, default=3.0, help="ping timeout")
+    return parser
+
+
+def run(argv: list[str] | None = None) -> int:
+    try:
+        return asyncio.run(main(build_parser().parse_args(argv)))
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(run())
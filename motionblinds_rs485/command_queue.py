@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+DEFAULT_MAX_DEPTH = 16
+
+OPPOSITE_COMMANDS = {"start": "stop", "stop": "start"}
+
+
+class CommandQueueFullException(Exception):
+    """Used to indicate too many commands are waiting for a box."""
+
+
+class CommandSupersededException(Exception):
+    """Used to indicate a newer opposite command replaced this one before it was sent."""
+
+
+@dataclass(slots=True)
+class QueuedCommand:
+    command: str
+    scenes: tuple[int, ...]
+    future: asyncio.Future
+
+
+class CommandQueue:
+    """Send commands to one box one at a time, collapsing redundant ones.
+
+    Commands are matched per scene, the last writer wins. An opposite command
+    (a stop after a start) takes its scenes out of the waiting commands: one
+    left without scenes fails with CommandSupersededException, it was never
+    sent. A command equal to one that is still waiting shares its result,
+    unless a later waiting command touches the same scenes, then it is
+    queued behind that one.
+    """
+
+    __slots__ = (
+        "_send",
+        "max_depth",
+        "_pending",
+        "_worker",
+        "_in_flight",
+        "coalesced",
+        "superseded",
+    )
+
+    def __init__(
+        self,
+        send: Callable[[str, tuple[int, ...]], Awaitable[None]],
+        max_depth: int = DEFAULT_MAX_DEPTH,
+    ) -> None:
+        self._send = send
+        self.max_depth = max_depth
+        # At most max_depth long, a list is much smaller than a deque
+        self._pending: list[QueuedCommand] = []
+        self._worker: asyncio.Task | None = None
+        self._in_flight: QueuedCommand | None = None
+        # Commands sharing the result of an equal one, and replaced by an
+        # opposite one
+        self.coalesced = 0
+        self.superseded = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    async def submit(self, command: str, scenes: tuple[int, ...]) -> None:
+        """Queue a command and wait until it was sent or failed.
+
+        Raises CommandSupersededException when opposite commands replaced all
+        its scenes before it was sent.
+        """
+        opposite = OPPOSITE_COMMANDS.get(command)
+        for queued in list(self._pending):
+            if queued.command != opposite:
+                continue
+            remaining = tuple(scene for scene in queued.scenes if scene not in scenes)
+            if len(remaining) == len(queued.scenes):
+                continue
+            queued.scenes = remaining
+            if len(remaining) == 0:
+                self._pending.remove(queued)
+                queued.future.set_exception(
+                    CommandSupersededException(f"{queued.command} superseded by {command}")
+                )
+                self.superseded += 1
+        # The last waiting command touching these scenes, sharing its result
+        # keeps the order of the commands for each scene
+        for queued in reversed(self._pending):
+            if queued.command == command and queued.scenes == scenes:
+                self.coalesced += 1
+                return await asyncio.shield(queued.future)
+            if not set(queued.scenes).isdisjoint(scenes):
+                break
+        if len(self._pending) >= self.max_depth:
+            raise CommandQueueFullException(
+                f"More than {self.max_depth} commands waiting"
+            )
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(QueuedCommand(command, scenes, future))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        return await asyncio.shield(future)
+
+    async def _run(self) -> None:
+        while len(self._pending) != 0:
+            queued = self._in_flight = self._pending.pop(0)
+            try:
+                await self._send(queued.command, queued.scenes)
+            except Exception as exception:  # pylint: disable=broad-except
+                if not queued.future.done():
+                    queued.future.set_exception(exception)
+            else:
+                if not queued.future.done():
+                    queued.future.set_result(None)
+            finally:
+                self._in_flight = None
+
+    def close(self) -> None:
+        """Cancel the commands that have not been sent yet."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if self._in_flight is not None:
+            self._in_flight.future.cancel()
+            self._in_flight = None
+        while len(self._pending) != 0:
+            self._pending.pop(0).future.cancel()
@@ -1,109 +1,511 @@
-from aiohttp import ClientTimeout, ClientSession, ClientResponse
-from requests.exceptions import ConnectionError
+from aiohttp import (
+    ClientConnectionError,
+    ClientConnectorError,
+    ClientError,
+    ClientTimeout,
+    ClientSession,
+    TCPConnector,
+)
 import asyncio
+import time
 from json import JSONDecodeError
-from zeroconf import Zeroconf, ServiceBrowser, ServiceListener, IPVersion
+from collections.abc import Callable, Iterable
+from typing import Any
 
+from zeroconf import Zeroconf
 
-class MotionBlindsRS485Listener(ServiceListener):
-    def __init__(self, rs485) -> None:
-        self.rs485 = rs485
-        super().__init__()
+from .admission import AdmissionController
+from .command_queue import CommandQueue, CommandSupersededException
+from .discovery import (
+    DEFAULT_TTL,
+    MotionBlindsRS485Discovery,
+    canonical_hostname,
+    normalize_hostname,
+)
+from .exceptions import (
+    AdmissionTimeoutException,
+    CircuitOpenException,
+    NoAddressException,
+)
+from .metrics import DeviceMetrics
+from .offline import OfflineBuffer
+from .profiling import profiled
+from .push import EVENT_SCENE_FINISHED, EVENT_SCENE_STARTED, PushChannel
+from .resolver import async_resolve
+from .retry import (
+    DEFAULT_RETRY_POLICY,
+    CircuitBreaker,
+    call_with_retry,
+    is_transport_error,
+)
+from .scanner import async_locate, root_hostname
+from .transport import HttpTransport, Transport
 
-    def update_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        print(f"Service {name} updated")
-        pass
+# Listed in the "features" of the root endpoint by firmware that accepts
+# /start?scenes=1,2,3
+FEATURE_BATCH = "batch"
 
-    def remove_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        print("Removed")
-        pass
+# Repeating these leaves the blinds in the same state, so they may be retried
+# even when an earlier attempt might have reached the box
+IDEMPOTENT_COMMANDS = {"start", "stop"}
 
-    def add_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        info = zc.get_service_info(type_, name)
-        # print(f"Service {name} added, service info: {info}")
-        # print(info._ipv4_addresses[0])
-        if self.rs485.hostname == info.server:
-            ip_address = info.ip_addresses_by_version(IPVersion.V4Only)[0]
-            print(f"Found IP of {info.server}: {ip_address}")
-            self.rs485.set_ip_address(ip_address)
+# Left for the request itself after finding the box and waiting for
+# admission, in seconds
+MIN_REQUEST_TIMEOUT = 0.1
 
+# Networks of a box mDNS does not reach are scanned at most this often
+MIN_SCAN_INTERVAL = 300
 
-class MotionBlindsRS485Device:
-    hostname: str
-    key: str
-    ip_address: str | None = None
 
-    zeroconf: Zeroconf
-    browser: ServiceBrowser
+class MotionBlindsRS485Device:
+    # Installations can have hundreds of boxes
+    __slots__ = (
+        "hostname",
+        "key",
+        "zeroconf",
+        "ip_address",
+        "_address_expires",
+        "_address_event",
+        "_revalidate_task",
+        "networks",
+        "_next_scan",
+        "metrics",
+        "retry_policy",
+        "circuit_breaker",
+        "running_scenes",
+        "_event_listeners",
+        "push",
+        "_command_queue",
+        "supports_batch",
+        "_session",
+        "_owns_session",
+        "_discovery",
+        "_admission",
+        "transport",
+        "offline_buffer",
+        "_flush_task",
+    )
 
-    def __init__(self, hostname: str, key: str = "", use_ha: bool = False) -> None:
+    def __init__(
+        self,
+        hostname: str,
+        key: str = "",
+        use_ha: bool = False,
+        session: ClientSession | None = None,
+        zeroconf: Zeroconf | None = None,
+        admission: AdmissionController | None = None,
+        transport: Transport | None = None,
+        offline_buffer: OfflineBuffer | None = None,
+        networks: Iterable[str] = (),
+    ) -> None:
         self.hostname = hostname
         self.key = key
-        if not use_ha:
-            self.zeroconf = Zeroconf()
-            self.browser = ServiceBrowser(
-                self.zeroconf, "_http._tcp.local.", MotionBlindsRS485Listener(self)
-            )
+        self.zeroconf = zeroconf
+        self.ip_address: str | None = None
+        self._address_expires = 0.0
+        # Only created when someone waits for the address
+        self._address_event: asyncio.Event | None = None
+        self._revalidate_task: asyncio.Task | None = None
+        # CIDR ranges scanned for the box when mDNS and DNS do not find it,
+        # e.g. on another VLAN
+        self.networks = tuple(networks)
+        self._next_scan = 0.0
+        self.metrics = DeviceMetrics()
+        # Immutable, so all devices share the default one
+        self.retry_policy = DEFAULT_RETRY_POLICY
+        self.circuit_breaker = CircuitBreaker()
+        # Scenes the box reported as running over the push channel
+        self.running_scenes: set[int] = set()
+        self._event_listeners: list[Callable[[dict[str, Any]], None]] = []
+        self.push = PushChannel(self, self._handle_event)
+        # Commands to this box are sent one at a time, redundant ones collapsed
+        self._command_queue = CommandQueue(self._send_scenes)
+        # Whether the firmware accepts several scenes in one request, unknown
+        # until asked
+        self.supports_batch: bool | None = None
+        # A session passed in (e.g. Home Assistant's shared one) is borrowed and
+        # never closed here, otherwise one is created lazily and owned
+        self._session = session
+        self._owns_session = session is None
+        # Requests wait here for a free slot of this box and of the whole
+        # fleet, by default shared with all devices in the process
+        self._admission = (admission or AdmissionController.shared()).box(
+            normalize_hostname(hostname)
+        )
+        # Through the HTTP API of the box unless e.g. a serial port is given
+        self.transport = transport or HttpTransport()
+        self.transport.attach(self)
+        # Without a buffer commands for an unreachable box fail, with one they
+        # are kept and sent when the box is back
+        self.offline_buffer = offline_buffer
+        self._flush_task: asyncio.Task | None = None
+        # Home Assistant does its own discovery, otherwise all devices in the
+        # process share one
+        self._discovery: MotionBlindsRS485Discovery | None = None
+        if not use_ha and self.transport.networked:
+            self._discovery = MotionBlindsRS485Discovery.shared()
+            self._discovery.register(self)
 
     def set_key(self, key: str) -> None:
         self.key = key
 
-    def set_ip_address(self, ip_address: str) -> None:
+    def set_ip_address(self, ip_address: str, ttl: float = DEFAULT_TTL) -> None:
+        """Set the IP address, it is revalidated in the background after ttl seconds."""
         self.ip_address = ip_address
+        self._address_expires = time.monotonic() + ttl
+        if self._address_event is not None:
+            self._address_event.set()
+        if self.offline_buffer is not None and self.offline_buffer.offline:
+            # Announced again, e.g. after roaming to another access point
+            self.schedule_flush()
+
+    def _get_zeroconf(self) -> Zeroconf | None:
+        if self.zeroconf is not None:
+            return self.zeroconf
+        if self._discovery is not None and self._discovery.aiozc is not None:
+            return self._discovery.aiozc.zeroconf
+        return None
+
+    async def resolve_address(self, locate: bool = True) -> str | None:
+        """Query the current address of the box, keeps the last known one on failure.
+
+        Asks mDNS and DNS, and with locate, when neither knows the box, looks
+        for it in its networks. That scan takes seconds, it is never part of
+        sending a command.
+        """
+        if (result := await async_resolve(self.hostname, self._get_zeroconf())) is not None:
+            self.set_ip_address(*result)
+        elif (
+            locate
+            and len(self.networks) != 0
+            and (ip_address := await self._locate()) is not None
+        ):
+            self.set_ip_address(ip_address)
+        return self.ip_address
+
+    async def _locate(self) -> str | None:
+        """Find the box in its networks, trying the last known address first."""
+        if self.ip_address is not None:
+            try:
+                json = await self._request(self.ip_address, "/", None, timeout=3)
+            except (
+                ClientError,
+                asyncio.TimeoutError,
+                AdmissionTimeoutException,
+                ValueError,
+            ):
+                pass
+            else:
+                if (
+                    isinstance(json, dict)
+                    and json.get("status") == "ok"
+                    # Firmware that does not tell its hostname is taken at
+                    # its word
+                    and root_hostname(json) in (None, canonical_hostname(self.hostname))
+                ):
+                    return self.ip_address
+        if time.monotonic() < self._next_scan:
+            return None
+        self._next_scan = time.monotonic() + MIN_SCAN_INTERVAL
+        result = await async_locate(self.hostname, self.networks)
+        return result.address if result is not None else None
+
+    def schedule_revalidate(self) -> None:
+        """Resolve the address again in the background, scanning its networks if need be."""
+        if self._revalidate_task is None or self._revalidate_task.done():
+            self._revalidate_task = asyncio.get_running_loop().create_task(
+                self.resolve_address()
+            )
+
+    async def _get_address(self, timeout: float = 3) -> str:
+        if self.ip_address is None:
+            # Not discovered yet, ask the network directly
+            try:
+                await asyncio.wait_for(self.resolve_address(locate=False), timeout)
+            except asyncio.TimeoutError:
+                pass
+            if self.ip_address is None:
+                if len(self.networks) != 0:
+                    self.schedule_revalidate()
+                raise NoAddressException(f"No IP address for {self.hostname}")
+        elif time.monotonic() > self._address_expires:
+            # Use the stale address right away, refresh it for the next command
+            self.schedule_revalidate()
+        return self.ip_address
+
+    async def wait_for_address(self, timeout: float) -> str:
+        """Wait until the IP address is known, raises asyncio.TimeoutError."""
+        if self.ip_address is None:
+            if self._address_event is None:
+                self._address_event = asyncio.Event()
+            if self._discovery is not None:
+                await self._discovery.async_start()
+            await asyncio.wait_for(self._address_event.wait(), timeout)
+        return self.ip_address
+
+    def _get_session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            # Keep connections to the box alive so consecutive commands skip
+            # the TCP handshake
+            self._session = ClientSession(
+                connector=TCPConnector(limit_per_host=2, keepalive_timeout=30)
+            )
+            self._owns_session = True
+        return self._session
+
+    def add_event_listener(
+        self, listener: Callable[[dict[str, Any]], None]
+    ) -> Callable[[], None]:
+        """Call listener with every event pushed by the box, returns a function to remove it.
+
+        Events only arrive after start_push().
+        """
+        self._event_listeners.append(listener)
+        return lambda: self._event_listeners.remove(listener)
+
+    def start_push(self) -> None:
+        """Keep a push channel open to the box, reconnecting when it drops.
+
+        Not started when the box takes a single request at a time, the
+        channel would hold that slot for good.
+        """
+        if self.transport.networked and self._admission.limit > 1:
+            self.push.start()
 
-    async def request(self, url: str, timeout: int = 3):
-        timeout = ClientTimeout(total=timeout)  # Set the timeout
-        async with ClientSession() as session:  # Create a session
-            async with session.get(url) as response:  # Perform a GET request
-                return await response.json()
+    @profiled
+    def _handle_event(self, event: dict[str, Any]) -> None:
+        if event.get("event") == EVENT_SCENE_STARTED:
+            self.running_scenes.add(event["scene"])
+        elif event.get("event") == EVENT_SCENE_FINISHED:
+            self.running_scenes.discard(event["scene"])
+        for listener in list(self._event_listeners):
+            listener(event)
 
-    async def ping(self) -> bool:
-        if self.ip_address == None:
-            raise Exception(f"No IP address for {self.hostname}")
+    @property
+    def coalesced_commands(self) -> int:
+        """Number of commands that were collapsed into another one."""
+        return self._command_queue.coalesced
+
+    @property
+    def superseded_commands(self) -> int:
+        """Number of commands replaced by an opposite one before they were sent."""
+        return self._command_queue.superseded
+
+    async def close(self) -> None:
+        """Close the HTTP session if it is owned by this device."""
+        self._command_queue.close()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self.push.stop()
+        await self.transport.close()
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+        if self._revalidate_task is not None:
+            self._revalidate_task.cancel()
+        if self._discovery is not None:
+            self._discovery.unregister(self)
+            if self._discovery.registered == 0:
+                await self._discovery.async_stop()
+            self._discovery = None
+
+    @profiled
+    async def _request(
+        self, ip_address: str, path: str, params: dict[str, Any] | None, timeout: float
+    ):
+        session = self._get_session()
+        # Waiting for a slot is part of the timeout, so retries keep to their
+        # deadline
         try:
-            await self.request(f"http://{self.ip_address}", timeout=3)
-            return True
-        except ConnectionError:
-            return False
-
-    async def _scene_control(self, command: str, scene: int) -> None:
-        if self.ip_address == None:
-            raise Exception(f"No IP address for {self.hostname}")
-        if scene < 1 or scene > 15:
-            raise ValueError("Scene must be between 0 and 15")
-        url = f"http://{self.ip_address}/{command}?scene={scene}"
-        if self.key != "":
-            url += f"&key={self.key}"
-        print(url)
+            waited = await asyncio.wait_for(self._admission.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionTimeoutException(
+                f"No free slot for {self.hostname} within {timeout:.1f}s"
+            ) from None
+        self.metrics.record_queue_wait(waited)
+        start_time = time.perf_counter()
+        try:
+            async with session.get(
+                f"http://{ip_address}{path}",
+                params=params,
+                timeout=ClientTimeout(
+                    total=max(timeout - waited, MIN_REQUEST_TIMEOUT)
+                ),
+            ) as response:
+                response.raise_for_status()
+                json = await response.json()
+        except asyncio.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        except ClientConnectionError:
+            self.metrics.record_connection_error()
+            raise
+        except Exception:
+            self.metrics.record_error()
+            raise
+        finally:
+            self._admission.release()
+        self.metrics.record_success(path, time.perf_counter() - start_time)
+        return json
+
+    async def request(
+        self, path: str = "/", params: dict[str, Any] | None = None, timeout: float = 3
+    ):
+        """Send a request to the box, within timeout seconds including finding it."""
+        start_time = time.monotonic()
+        ip_address = await self._get_address(timeout)
+        timeout = max(timeout - (time.monotonic() - start_time), MIN_REQUEST_TIMEOUT)
+        try:
+            return await self._request(ip_address, path, params, timeout)
+        except ClientConnectorError:
+            # The box may have moved to another address. Looking it up is
+            # left to the background so this attempt keeps to its timeout, a
+            # retry uses the new address once it is known.
+            self.schedule_revalidate()
+            raise
+
+    def _set_features(self, json: Any) -> None:
+        self.supports_batch = isinstance(json, dict) and FEATURE_BATCH in json.get(
+            "features", []
+        )
 
+    @profiled
+    async def ping(self, timeout: float = 3) -> bool:
+        reachable = await self.transport.ping(timeout)
+        if (buffer := self.offline_buffer) is not None:
+            if reachable and buffer.offline:
+                self.schedule_flush()
+            elif not reachable:
+                buffer.offline = True
+                buffer.expire()
+                self._offline_buffer_changed()
+        return reachable
+
+    async def validate_key(self, key: str | None = None, timeout: float = 3) -> bool:
+        """Whether the box does not reject key, the key of the device by default.
+
+        Only the read-only root endpoint is asked, with the key, so checking
+        a key never reaches the motors. Whether the firmware checks a key
+        there is not known: the key is only known to be checked by /start
+        and /stop. A box that does not check it accepts every key here, and
+        a wrong one is rejected by the first command (InvalidKeyException,
+        counted in the invalid key errors).
+        """
+        if not self.transport.networked:
+            # Nothing on the bus checks a key
+            return True
+        key = self.key if key is None else key
         json = await self.request(
-            url,
-            timeout=3,
+            params={"key": key} if key != "" else None, timeout=timeout
+        )
+        return not (
+            isinstance(json, dict)
+            and json.get("status") == "error"
+            and json.get("message") == "invalid key"
         )
-        if "status" in json and json["status"] == "error":
-            if "message" in json and json["message"] == "invalid key":
-                raise InvalidKeyException("Invalid key")
 
-    async def start(self, scene: int) -> None:
-        return await self._scene_control("start", scene)
+    @profiled
+    async def _scene_control(self, command: str, scenes: tuple[int, ...]) -> None:
+        await call_with_retry(
+            lambda timeout: self.transport.send_scenes(command, scenes, timeout),
+            self.retry_policy,
+            self.circuit_breaker,
+            idempotent=command in IDEMPOTENT_COMMANDS,
+        )
 
-    async def stop(self, scene: int) -> None:
-        return await self._scene_control("stop", scene)
+    async def _send_scenes(self, command: str, scenes: tuple[int, ...]) -> None:
+        if len(scenes) > 1 and await self.transport.detect_batch_support():
+            await self._scene_control(command, scenes)
+            return
+        # One request per scene, back to back over the kept-alive connection
+        for scene in scenes:
+            await self._scene_control(command, (scene,))
 
+    async def _submit(self, command: str, scenes: Iterable[int]) -> bool:
+        """Send a command, returns False when it was buffered until the box is back."""
+        scenes = tuple(sorted(set(scenes)))
+        if len(scenes) == 0:
+            raise ValueError("No scenes given")
+        if scenes[0] < 1 or scenes[-1] > 15:
+            raise ValueError("Scene must be between 1 and 15")
+        buffer = self.offline_buffer
+        if buffer is None or not buffer.offline:
+            try:
+                await self._command_queue.submit(command, scenes)
+                return True
+            except Exception as exception:
+                if buffer is None or not (
+                    is_transport_error(exception)
+                    or isinstance(exception, CircuitOpenException)
+                ):
+                    raise
+                buffer.offline = True
+        # Known to be unreachable, do not wait for timeouts again. Whether it
+        # is back is checked right away, e.g. after roaming with the same
+        # address, and on every health poll while commands are buffered.
+        buffer.add(command, scenes)
+        self._offline_buffer_changed()
+        self.schedule_flush(probe=True)
+        return False
 
-class InvalidKeyException(Exception):
-    """Used to indicate the key was invalid."""
+    def _offline_buffer_changed(self) -> None:
+        self.metrics.record_offline_buffer(
+            self.offline_buffer.depth, self.offline_buffer.dropped
+        )
+
+    def schedule_flush(self, probe: bool = False) -> None:
+        """Send the buffered commands in the background, the box is back.
+
+        With probe, only once a ping shows the box is back.
+        """
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._probe_and_flush() if probe else self.flush_offline_buffer()
+            )
 
+    async def _probe_and_flush(self) -> None:
+        if await self.transport.ping(timeout=3):
+            await self.flush_offline_buffer()
 
-if __name__ == "__main__":
+    async def flush_offline_buffer(self) -> None:
+        """Send the buffered commands, they are buffered again if that fails."""
+        buffer = self.offline_buffer
+        if buffer is None:
+            return
+        buffer.offline = False
+        commands = buffer.take()
+        if len(commands) != 0:
+            # The box was seen, do not wait for the circuit to reset
+            self.circuit_breaker.record_success()
+        while len(commands) != 0:
+            command, scenes, _ = commands[0]
+            try:
+                await self._command_queue.submit(command, scenes)
+            except CommandSupersededException:
+                # A command sent meanwhile replaced it
+                buffer.superseded += len(scenes)
+            except Exception as exception:  # pylint: disable=broad-except
+                if is_transport_error(exception) or isinstance(
+                    exception, CircuitOpenException
+                ):
+                    buffer.offline = True
+                    buffer.requeue(commands)
+                    break
+                buffer.failed += len(scenes)
+            else:
+                buffer.flushed += len(scenes)
+            commands.pop(0)
+        self._offline_buffer_changed()
 
-    async def main():
-        rs485 = MotionBlindsRS485Device("motionblinds-rs485-D4D4DA8512FC.local.", False)
+    async def start(self, scene: int) -> bool:
+        return await self._submit("start", (scene,))
 
-        await asyncio.sleep(2)
+    async def stop(self, scene: int) -> bool:
+        return await self._submit("stop", (scene,))
 
-        print(await rs485.start(7))
+    async def start_many(self, scenes: Iterable[int]) -> bool:
+        return await self._submit("start", scenes)
 
-        await asyncio.sleep(100)
+    async def stop_many(self, scenes: Iterable[int]) -> bool:
+        return await self._submit("stop", scenes)
 
-    asyncio.run(main())
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import re
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from zeroconf import DNSAddress, IPVersion, ServiceStateChange, Zeroconf
+from zeroconf.asyncio import AsyncServiceBrowser, AsyncServiceInfo, AsyncZeroconf
+
+if TYPE_CHECKING:
+    from .device import MotionBlindsRS485Device
+
+SERVICE_TYPE = "_http._tcp.local."
+NAME_PREFIX = "motionblinds"
+RESOLVE_TIMEOUT = 3000  # ms
+# Default TTL of mDNS address records (RFC 6762)
+DEFAULT_TTL = 120
+
+_MOTIONBLINDS_HOSTNAME = re.compile(r"^(motionblinds-rs485-)([0-9a-f]{12})$")
+
+
+def normalize_hostname(hostname: str) -> str:
+    """Strip the .local(.) suffix, motionblinds-rs485-XX.local. -> motionblinds-rs485-xx."""
+    return hostname.lower().rstrip(".").removesuffix(".local")
+
+
+def canonical_hostname(hostname: str) -> str:
+    """Write a hostname the way the box announces it, motionblinds-rs485-D4D4DA8512FC."""
+    hostname = normalize_hostname(hostname)
+    if (match := _MOTIONBLINDS_HOSTNAME.match(hostname)) is not None:
+        return match.group(1) + match.group(2).upper()
+    return hostname
+
+
+def format_address(ip_address: str, port: int | None) -> str:
+    """Add the port to the address when it is not the default HTTP port."""
+    return ip_address if port in (None, 80) else f"{ip_address}:{port}"
+
+
+def address_ttl(info: AsyncServiceInfo) -> float:
+    """Get the lowest TTL of the address records of a resolved service."""
+    ttls = [
+        record.ttl
+        for record in info.get_address_and_nsec_records()
+        if isinstance(record, DNSAddress)
+    ]
+    return min(ttls) if len(ttls) != 0 else DEFAULT_TTL
+
+
+class MotionBlindsRS485Discovery:
+    """Asynchronous zeroconf discovery shared by all devices in a process."""
+
+    _shared: MotionBlindsRS485Discovery | None = None
+
+    aiozc: AsyncZeroconf | None = None
+    browser: AsyncServiceBrowser | None = None
+
+    def __init__(self, aiozc: AsyncZeroconf | None = None) -> None:
+        self.aiozc = aiozc
+        self._owns_zeroconf = aiozc is None
+        self._devices: dict[str, MotionBlindsRS485Device] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._listeners: list[Callable[[str, str], None]] = []
+        # Every box seen on the network, hostname -> IP address
+        self.discovered: dict[str, str] = {}
+
+    @classmethod
+    def shared(cls, aiozc: AsyncZeroconf | None = None) -> MotionBlindsRS485Discovery:
+        """Get the discovery shared by all standalone devices.
+
+        aiozc is only used when the shared discovery does not exist yet.
+        """
+        if cls._shared is None:
+            cls._shared = cls(aiozc)
+        return cls._shared
+
+    @property
+    def registered(self) -> int:
+        return len(self._devices)
+
+    def register(self, device: MotionBlindsRS485Device) -> None:
+        hostname = normalize_hostname(device.hostname)
+        self._devices[hostname] = device
+        if (ip_address := self.discovered.get(hostname)) is not None:
+            # May be outdated, revalidate before use
+            device.set_ip_address(ip_address, ttl=0)
+
+    def unregister(self, device: MotionBlindsRS485Device) -> None:
+        self._devices.pop(normalize_hostname(device.hostname), None)
+
+    def add_listener(self, listener: Callable[[str, str], None]) -> Callable[[], None]:
+        """Call listener with the hostname and address of every box resolved.
+
+        Returns a function to remove it.
+        """
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    async def async_start(self) -> None:
+        """Start browsing, does nothing if already started."""
+        if self.browser is not None:
+            return
+        if self.aiozc is None:
+            self.aiozc = AsyncZeroconf(ip_version=IPVersion.V4Only)
+        self.browser = AsyncServiceBrowser(
+            self.aiozc.zeroconf,
+            SERVICE_TYPE,
+            handlers=[self._on_service_state_change],
+        )
+
+    async def async_stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self.browser is not None:
+            await self.browser.async_cancel()
+            self.browser = None
+        if self._owns_zeroconf and self.aiozc is not None:
+            await self.aiozc.async_close()
+            self.aiozc = None
+        if MotionBlindsRS485Discovery._shared is self:
+            MotionBlindsRS485Discovery._shared = None
+
+    def _on_service_state_change(
+        self,
+        zeroconf: Zeroconf,
+        service_type: str,
+        name: str,
+        state_change: ServiceStateChange,
+    ) -> None:
+        if state_change is ServiceStateChange.Removed:
+            return
+        if not name.lower().startswith(NAME_PREFIX):
+            return
+        # Resolving waits on the network, so do it in a task instead of the
+        # zeroconf callback
+        task = asyncio.get_running_loop().create_task(
+            self._async_resolve(service_type, name)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _async_resolve(self, service_type: str, name: str) -> None:
+        info = AsyncServiceInfo(service_type, name)
+        if not await info.async_request(self.aiozc.zeroconf, RESOLVE_TIMEOUT):
+            return
+        addresses = info.parsed_addresses(IPVersion.V4Only)
+        if info.server is None or len(addresses) == 0:
+            return
+        hostname = normalize_hostname(info.server)
+        ip_address = format_address(addresses[0], info.port)
+        self.discovered[hostname] = ip_address
+        if (device := self._devices.get(hostname)) is not None:
+            device.set_ip_address(ip_address, address_ttl(info))
+        for listener in list(self._listeners):
+            listener(hostname, ip_address)
@@ -0,0 +1,22 @@
+class InvalidKeyException(Exception):
+    """Used to indicate the key was invalid."""
+
+
+class NoAddressException(Exception):
+    """Used to indicate the IP address of the box is unknown."""
+
+
+class CircuitOpenException(Exception):
+    """Used to indicate requests to the box are refused after repeated errors."""
+
+
+class AdmissionTimeoutException(Exception):
+    """Used to indicate a request found no free slot of the box in time."""
+
+
+class SerialTransportException(Exception):
+    """Used to indicate the serial port could not be opened or written."""
+
+
+class InvalidFrameException(Exception):
+    """Used to indicate bytes read from the bus are not a valid frame."""
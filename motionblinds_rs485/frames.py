@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from .exceptions import InvalidFrameException
+
+# Assumed scene frame, NOT verified against a capture of a real bus:
+#   0x55 | 0x00 0x00 (all motors) | command | scene | CRC-16/MODBUS (LE)
+# Everything about the wire format is kept in this module, so it is the only
+# place to change once a capture shows what the Domotica Box writes
+FRAME_FORMAT_VERIFIED = False
+
+FRAME_START = 0x55
+FRAME_BROADCAST = b"\x00\x00"
+FRAME_LENGTH = 7
+
+COMMAND_CODES = {"start": 0x01, "stop": 0x02}
+COMMAND_NAMES = {code: command for command, code in COMMAND_CODES.items()}
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/MODBUS of data."""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def build_scene_frame(command: str, scene: int) -> bytes:
+    """Frame that makes the motors run command for scene."""
+    if command not in COMMAND_CODES:
+        raise ValueError(f"Unknown command {command}")
+    if not 1 <= scene <= 15:
+        raise ValueError("Scene must be between 1 and 15")
+    body = bytes((FRAME_START, *FRAME_BROADCAST, COMMAND_CODES[command], scene))
+    return body + crc16(body).to_bytes(2, "little")
+
+
+def build_scene_frames(command: str, scenes: Iterable[int]) -> bytes:
+    """Frames for several scenes, written back to back in one go."""
+    return b"".join(build_scene_frame(command, scene) for scene in scenes)
+
+
+def parse_frame(frame: bytes) -> tuple[str, int]:
+    """Command and scene of a scene frame, raises InvalidFrameException."""
+    if len(frame) != FRAME_LENGTH or frame[0] != FRAME_START:
+        raise InvalidFrameException(f"Not a scene frame: {frame.hex()}")
+    if crc16(frame[:-2]) != int.from_bytes(frame[-2:], "little"):
+        raise InvalidFrameException(f"Bad checksum: {frame.hex()}")
+    if (command := COMMAND_NAMES.get(frame[3])) is None:
+        raise InvalidFrameException(f"Unknown command {frame[3]:#04x}")
+    return command, frame[4]
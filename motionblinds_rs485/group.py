@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from .device import MotionBlindsRS485Device
+
+# Connections idle for longer than this may have been closed, ping first
+PREWARM_AGE = 10.0
+
+
+@dataclass(slots=True)
+class GroupDispatchResult:
+    # Seconds between the first and the last box acknowledging the command
+    spread: float
+    errors: dict[str, Exception] = field(default_factory=dict)
+    # Boxes that were unreachable, the command is buffered until they are back
+    queued: list[str] = field(default_factory=list)
+
+
+class SceneGroup:
+    """A logical scene made of scenes on several boxes, dispatched together."""
+
+    def __init__(
+        self, members: Iterable[tuple[MotionBlindsRS485Device, int]]
+    ) -> None:
+        self.scenes: dict[MotionBlindsRS485Device, list[int]] = {}
+        for device, scene in members:
+            self.scenes.setdefault(device, []).append(scene)
+
+    async def prewarm(self) -> None:
+        """Open connections to the boxes that were not contacted recently.
+
+        Pinging also learns whether the firmware takes several scenes at once.
+        """
+        await asyncio.gather(
+            *(
+                device.ping()
+                for device in self.scenes
+                if (age := device.metrics.seconds_since_last_success) is None
+                or age > PREWARM_AGE
+                or device.supports_batch is None
+            )
+        )
+
+    async def start(self) -> GroupDispatchResult:
+        return await self._dispatch(MotionBlindsRS485Device.start_many)
+
+    async def stop(self) -> GroupDispatchResult:
+        return await self._dispatch(MotionBlindsRS485Device.stop_many)
+
+    async def _dispatch(self, command) -> GroupDispatchResult:
+        await self.prewarm()
+        acknowledged: list[float] = []
+        result = GroupDispatchResult(spread=0.0)
+
+        async def send(device: MotionBlindsRS485Device, scenes: list[int]) -> None:
+            try:
+                sent = await command(device, scenes)
+            except Exception as exception:  # pylint: disable=broad-except
+                result.errors[device.hostname] = exception
+            else:
+                if sent:
+                    acknowledged.append(time.monotonic())
+                else:
+                    result.queued.append(device.hostname)
+
+        # All requests go out in the same loop iteration
+        await asyncio.gather(
+            *(send(device, scenes) for device, scenes in self.scenes.items())
+        )
+        if len(acknowledged) > 1:
+            result.spread = max(acknowledged) - min(acknowledged)
+        return result
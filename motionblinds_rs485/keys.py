@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterable
+
+from aiohttp import ClientError
+
+from .device import MotionBlindsRS485Device
+from .exceptions import AdmissionTimeoutException, NoAddressException
+
+# Seconds a validation result is reused
+DEFAULT_TTL = 300.0
+# The ESP32 only handles a few sockets at once
+MAX_CONCURRENT_PROBES = 2
+
+
+def parse_keys(keys: str) -> list[str]:
+    """Split comma separated candidate keys, "" stays the single empty key."""
+    candidates = [key.strip() for key in keys.split(",")]
+    return list(dict.fromkeys(key for key in candidates if key != "")) or [""]
+
+
+class KeyValidator:
+    """Check keys against boxes, remembering the answers for a while."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL) -> None:
+        self.ttl = ttl
+        self._results: dict[tuple[str, str], tuple[bool, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, device: MotionBlindsRS485Device, key: str) -> bool | None:
+        if (result := self._results.get((device.hostname, key))) is None:
+            return None
+        valid, expires = result
+        if time.monotonic() > expires:
+            del self._results[(device.hostname, key)]
+            return None
+        return valid
+
+    async def async_validate(self, device: MotionBlindsRS485Device, key: str) -> bool:
+        """Whether the box accepts key, raises when the box cannot be reached."""
+        if (valid := self.cached(device, key)) is not None:
+            self.hits += 1
+            return valid
+        self.misses += 1
+        valid = await device.validate_key(key)
+        self._results[(device.hostname, key)] = (valid, time.monotonic() + self.ttl)
+        return valid
+
+    async def async_find_key(
+        self, device: MotionBlindsRS485Device, keys: Iterable[str]
+    ) -> str | None:
+        """Try candidate keys concurrently and return the first the box accepts.
+
+        Returns None when the box rejected all of them, raises the last error
+        when it could not be asked about some and accepted none.
+        """
+        keys = list(keys)
+        # Known answers first, only the unknown keys go to the box
+        for key in keys:
+            if self.cached(device, key):
+                self.hits += 1
+                return key
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+
+        async def validate(key: str) -> str | None:
+            async with semaphore:
+                return key if await self.async_validate(device, key) else None
+
+        tasks = [asyncio.ensure_future(validate(key)) for key in keys]
+        error: Exception | None = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    if (key := await next_done) is not None:
+                        return key
+                except (
+                    ClientError,
+                    asyncio.TimeoutError,
+                    AdmissionTimeoutException,
+                    NoAddressException,
+                ) as exception:
+                    error = exception
+        finally:
+            for task in tasks:
+                task.cancel()
+        if error is not None:
+            raise error
+        return None
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+from typing import Any
+
+# Upper bounds of the latency buckets in seconds, the last bucket is unbounded
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LatencyHistogram:
+    """Fixed bucket histogram, recording is a bisect and two additions."""
+
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, duration: float) -> None:
+        self.counts[bisect_left(self.buckets, duration)] += 1
+        self.count += 1
+        self.total += duration
+
+    def percentile(self, percent: float) -> float | None:
+        """Upper bound of the bucket holding the percentile, None if empty."""
+        if self.count == 0:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        return self.buckets[min(index, len(self.buckets) - 1)]
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count != 0 else None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": {
+                str(bound): count
+                for bound, count in zip((*self.buckets, "inf"), self.counts)
+            },
+        }
+
+
+class DeviceMetrics:
+    """Request metrics of one box."""
+
+    __slots__ = (
+        "latency",
+        "overall_latency",
+        "queue_wait",
+        "requests",
+        "timeouts",
+        "connection_errors",
+        "invalid_key_errors",
+        "other_errors",
+        "last_success",
+        "buffered_commands",
+        "dropped_commands",
+        "_listeners",
+    )
+
+    def __init__(self) -> None:
+        # Per endpoint and over all endpoints
+        self.latency: dict[str, LatencyHistogram] = {}
+        self.overall_latency = LatencyHistogram()
+        # Time requests waited for admission before being sent
+        self.queue_wait = LatencyHistogram()
+        self.requests = 0
+        self.timeouts = 0
+        self.connection_errors = 0
+        self.invalid_key_errors = 0
+        self.other_errors = 0
+        self.last_success: float | None = None
+        # Commands waiting in the offline buffer, and dropped from it
+        self.buffered_commands = 0
+        self.dropped_commands = 0
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener after every recorded request, returns a function to remove it."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            listener()
+
+    def record_success(self, endpoint: str, duration: float) -> None:
+        if (histogram := self.latency.get(endpoint)) is None:
+            histogram = self.latency[endpoint] = LatencyHistogram()
+        histogram.record(duration)
+        self.overall_latency.record(duration)
+        self.requests += 1
+        self.last_success = time.time()
+        self._notify()
+
+    def record_queue_wait(self, duration: float) -> None:
+        # Followed by the outcome of the request, which notifies
+        self.queue_wait.record(duration)
+
+    def record_timeout(self) -> None:
+        self.requests += 1
+        self.timeouts += 1
+        self._notify()
+
+    def record_connection_error(self) -> None:
+        self.requests += 1
+        self.connection_errors += 1
+        self._notify()
+
+    def record_invalid_key(self) -> None:
+        self.invalid_key_errors += 1
+        self._notify()
+
+    def record_error(self) -> None:
+        self.requests += 1
+        self.other_errors += 1
+        self._notify()
+
+    def record_offline_buffer(self, depth: int, dropped: int) -> None:
+        self.buffered_commands = depth
+        self.dropped_commands = dropped
+        self._notify()
+
+    @property
+    def seconds_since_last_success(self) -> float | None:
+        if self.last_success is None:
+            return None
+        return time.time() - self.last_success
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "connection_errors": self.connection_errors,
+            "invalid_key_errors": self.invalid_key_errors,
+            "other_errors": self.other_errors,
+            "last_success": self.last_success,
+            "seconds_since_last_success": self.seconds_since_last_success,
+            "overall_latency": self.overall_latency.as_dict(),
+            "queue_wait": self.queue_wait.as_dict(),
+            "buffered_commands": self.buffered_commands,
+            "dropped_commands": self.dropped_commands,
+            "latency": {
+                endpoint: histogram.as_dict()
+                for endpoint, histogram in self.latency.items()
+            },
+        }
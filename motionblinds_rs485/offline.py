@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+# Older commands are dropped, the blinds should not move long after the
+# automation asked for it
+DEFAULT_MAX_AGE = 300.0
+
+
+@dataclass(slots=True)
+class BufferedCommand:
+    command: str
+    scene: int
+    queued_at: float
+
+
+class OfflineBuffer:
+    """Commands for a box that could not be reached, sent when it is back.
+
+    Only the last command per scene is kept, an earlier one is superseded:
+    a stop after a start of the same scene leaves just the stop. So there
+    are never more than 15 commands. Commands older than max_age are dropped.
+    """
+
+    __slots__ = (
+        "max_age",
+        "offline",
+        "_commands",
+        "buffered",
+        "superseded",
+        "expired",
+        "failed",
+        "flushed",
+    )
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE) -> None:
+        self.max_age = max_age
+        # Set when sending failed, commands are then buffered without trying
+        # until the box is seen again
+        self.offline = False
+        self._commands: dict[int, BufferedCommand] = {}
+        self.buffered = 0
+        self.superseded = 0
+        self.expired = 0
+        # Rejected by the box when flushed, e.g. an invalid key
+        self.failed = 0
+        self.flushed = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._commands)
+
+    @property
+    def dropped(self) -> int:
+        return self.superseded + self.expired + self.failed
+
+    def add(self, command: str, scenes: tuple[int, ...]) -> None:
+        queued_at = time.monotonic()
+        for scene in scenes:
+            if scene in self._commands:
+                self.superseded += 1
+            self._commands[scene] = BufferedCommand(command, scene, queued_at)
+            self.buffered += 1
+
+    def requeue(self, commands: list[tuple[str, tuple[int, ...], float]]) -> None:
+        """Put back commands taken but not sent, unless superseded meanwhile."""
+        for command, scenes, queued_at in commands:
+            for scene in scenes:
+                if scene in self._commands:
+                    # A newer command came in while flushing
+                    self.superseded += 1
+                else:
+                    self._commands[scene] = BufferedCommand(command, scene, queued_at)
+
+    def expire(self) -> None:
+        """Drop commands older than max_age."""
+        oldest = time.monotonic() - self.max_age
+        for scene, buffered in list(self._commands.items()):
+            if buffered.queued_at < oldest:
+                del self._commands[scene]
+                self.expired += 1
+
+    def take(self) -> list[tuple[str, tuple[int, ...], float]]:
+        """Empty the buffer, returns the commands to send in order.
+
+        Consecutive scenes with the same command are sent together, each with
+        the time of its oldest scene.
+        """
+        self.expire()
+        commands: list[tuple[str, tuple[int, ...], float]] = []
+        for buffered in sorted(
+            self._commands.values(), key=lambda buffered: buffered.queued_at
+        ):
+            if commands and commands[-1][0] == buffered.command:
+                command, scenes, queued_at = commands[-1]
+                commands[-1] = (command, (*scenes, buffered.scene), queued_at)
+            else:
+                commands.append(
+                    (buffered.command, (buffered.scene,), buffered.queued_at)
+                )
+        self._commands.clear()
+        return commands
+
+    def as_dict(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "offline": self.offline,
+            "depth": self.depth,
+            "commands": [
+                {
+                    "command": buffered.command,
+                    "scene": buffered.scene,
+                    "age": round(now - buffered.queued_at, 1),
+                }
+                for buffered in self._commands.values()
+            ],
+            "buffered": self.buffered,
+            "flushed": self.flushed,
+            "superseded": self.superseded,
+            "expired": self.expired,
+            "failed": self.failed,
+        }
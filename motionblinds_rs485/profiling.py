@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from collections.abc import Callable, Coroutine, Generator
+from typing import Any, TypeVar
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+# Holding the event loop longer than this is reported
+DEFAULT_THRESHOLD = 0.05
+MAX_STALLS = 50
+STACK_DEPTH = 20
+
+
+class FunctionStats:
+    __slots__ = ("calls", "total", "loop_time", "max_step", "slow_steps")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        # From the call until it returned, including awaits
+        self.total = 0.0
+        # Only while it was running on the event loop
+        self.loop_time = 0.0
+        self.max_step = 0.0
+        self.slow_steps = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "loop_ms": round(self.loop_time * 1000, 3),
+            "mean_loop_ms": round(self.loop_time / self.calls * 1000, 3)
+            if self.calls
+            else None,
+            "max_step_ms": round(self.max_step * 1000, 3),
+            "slow_steps": self.slow_steps,
+        }
+
+
+class _TimedCoroutine:
+    """Runs a coroutine, timing every step it takes on the event loop."""
+
+    __slots__ = ("_coroutine", "_stats", "_threshold")
+
+    def __init__(
+        self, coroutine: Coroutine, stats: FunctionStats, threshold: float
+    ) -> None:
+        self._coroutine = coroutine
+        self._stats = stats
+        self._threshold = threshold
+
+    def _record_step(self, duration: float) -> None:
+        stats = self._stats
+        stats.loop_time += duration
+        if duration > stats.max_step:
+            stats.max_step = duration
+        if duration > self._threshold:
+            stats.slow_steps += 1
+
+    def __await__(self) -> Generator[Any, Any, Any]:
+        coroutine = self._coroutine
+        start_time = time.perf_counter()
+        value: Any = None
+        exception: BaseException | None = None
+        try:
+            while True:
+                step_start = time.perf_counter()
+                try:
+                    if exception is not None:
+                        yielded = coroutine.throw(exception)
+                    else:
+                        yielded = coroutine.send(value)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    self._record_step(time.perf_counter() - step_start)
+                try:
+                    value, exception = (yield yielded), None
+                except GeneratorExit:
+                    coroutine.close()
+                    raise
+                except BaseException as thrown:  # pylint: disable=broad-except
+                    # e.g. cancellation, passed on to the coroutine
+                    value, exception = None, thrown
+        finally:
+            self._stats.calls += 1
+            self._stats.total += time.perf_counter() - start_time
+
+
+class Profiler:
+    """Opt-in timing of profiled functions and detection of a blocked event loop.
+
+    While running, every call of a function decorated with profiled is timed,
+    coroutines per step on the event loop. A watchdog thread samples the stack
+    of the event loop thread whenever the loop does not get around to a
+    heartbeat for threshold seconds.
+    """
+
+    _shared: Profiler | None = None
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.threshold = DEFAULT_THRESHOLD
+        self.started: float | None = None
+        self.stopped: float | None = None
+        self.stats: dict[str, FunctionStats] = {}
+        self.stalls: deque[dict[str, Any]] = deque(maxlen=MAX_STALLS)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat: asyncio.TimerHandle | None = None
+        self._last_tick = 0.0
+        self._current_stall: dict[str, Any] | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    @classmethod
+    def shared(cls) -> Profiler:
+        """Get the profiler used by the profiled decorator."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @property
+    def _interval(self) -> float:
+        return self.threshold / 2
+
+    def start(self, threshold: float = DEFAULT_THRESHOLD) -> None:
+        """Start profiling, from the event loop thread. Clears earlier results."""
+        if self.enabled:
+            self.stop()
+        self.threshold = threshold
+        self.stats = {}
+        self.stalls.clear()
+        self.started = time.time()
+        self.stopped = None
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._heartbeat = self._loop.call_later(self._interval, self._tick)
+        self._stop_event.clear()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="motionblinds_rs485 watchdog", daemon=True
+        )
+        self.enabled = True
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        """Stop profiling, the results are kept until the next start."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.stopped = time.time()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        self._stop_event.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        if (stall := self._current_stall) is not None:
+            # The loop is back, the stall lasted until now
+            stall["duration_ms"] = round(
+                (now - self._last_tick - self._interval) * 1000, 1
+            )
+            self._current_stall = None
+        self._last_tick = now
+        self._heartbeat = self._loop.call_later(self._interval, self._tick)
+
+    def _watch(self) -> None:
+        while not self._stop_event.wait(self._interval / 2):
+            last_tick = self._last_tick
+            if (
+                self._current_stall is not None
+                or time.monotonic() - last_tick < self.threshold
+            ):
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stall = {
+                "at": time.time(),
+                "duration_ms": None,
+                "stack": traceback.format_stack(frame, STACK_DEPTH)
+                if frame is not None
+                else [],
+            }
+            self._current_stall = stall
+            self.stalls.append(stall)
+
+    def _stats_for(self, name: str) -> FunctionStats:
+        if (stats := self.stats.get(name)) is None:
+            stats = self.stats[name] = FunctionStats()
+        return stats
+
+    def report(self) -> dict[str, Any]:
+        """Cost per function, most time on the event loop first, and the stalls."""
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "started": self.started,
+            "stopped": self.stopped,
+            "functions": {
+                name: stats.as_dict()
+                for name, stats in sorted(
+                    self.stats.items(), key=lambda item: -item[1].loop_time
+                )
+            },
+            "stalls": list(self.stalls),
+        }
+
+
+def _name(func: Callable) -> str:
+    # select.SceneSelect.async_select_option
+    return f"{func.__module__.rpartition('.')[2]}.{func.__qualname__}"
+
+
+def profiled(func: _F) -> _F:
+    """Time func while the shared profiler is enabled, nearly free otherwise."""
+    name = _name(func)
+
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            profiler = Profiler.shared()
+            if not profiler.enabled:
+                return await func(*args, **kwargs)
+            return await _TimedCoroutine(
+                func(*args, **kwargs), profiler._stats_for(name), profiler.threshold
+            )
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        profiler = Profiler.shared()
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        stats = profiler._stats_for(name)
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start_time
+            stats.calls += 1
+            stats.total += duration
+            stats.loop_time += duration
+            if duration > stats.max_step:
+                stats.max_step = duration
+            if duration > profiler.threshold:
+                stats.slow_steps += 1
+
+    return wrapper
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import yaml
+from aiohttp import ClientError, ClientSession
+from zeroconf import Zeroconf
+
+from .device import MotionBlindsRS485Device
+from .discovery import canonical_hostname
+from .exceptions import AdmissionTimeoutException
+from .keys import KeyValidator, parse_keys
+
+DEFAULT_WORKERS = 16
+MANIFEST_FIELDS = ("hostname", "key", "ip_address")
+
+
+class InvalidManifestException(Exception):
+    """Used to indicate the manifest of boxes could not be read."""
+
+
+@dataclass(slots=True)
+class ManifestEntry:
+    hostname: str
+    # Several candidates may be given separated by commas
+    key: str = ""
+    # Used instead of mDNS to reach the box when given
+    ip_address: str | None = None
+
+
+@dataclass(slots=True)
+class ProbeResult:
+    entry: ManifestEntry
+    ip_address: str | None = None
+    # The candidate key the box accepted
+    key: str | None = None
+    reachable: bool = False
+    valid_key: bool = False
+    supports_batch: bool | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.reachable and self.valid_key
+
+
+def _manifest_rows(text: str, manifest_format: str) -> list:
+    if manifest_format == "csv":
+        return list(csv.DictReader(io.StringIO(text.strip()), skipinitialspace=True))
+    try:
+        rows = yaml.safe_load(text)
+    except yaml.YAMLError as exception:
+        raise InvalidManifestException(f"Invalid YAML: {exception}") from exception
+    if rows is None:
+        return []
+    if isinstance(rows, dict):
+        # hostname: {key: ..., ip_address: ...}
+        for hostname, row in rows.items():
+            if row is not None and not isinstance(row, dict):
+                raise InvalidManifestException(
+                    f"{hostname} must map to key and ip_address"
+                )
+        rows = [{"hostname": hostname, **(row or {})} for hostname, row in rows.items()]
+    if not isinstance(rows, list):
+        raise InvalidManifestException("The manifest must be a list of boxes")
+    return rows
+
+
+def parse_manifest(text: str, manifest_format: str | None = None) -> list[ManifestEntry]:
+    """Parse a manifest of boxes, as YAML or as CSV with a hostname,key,ip_address header.
+
+    The format is taken from the header when not given.
+    """
+    if manifest_format is None:
+        manifest_format = (
+            "csv" if text.lstrip().lower().startswith("hostname,") else "yaml"
+        )
+    entries: dict[str, ManifestEntry] = {}
+    for number, row in enumerate(_manifest_rows(text, manifest_format), start=1):
+        if not isinstance(row, dict) or not row.get("hostname"):
+            raise InvalidManifestException(f"Box {number} has no hostname")
+        if unknown := set(row) - set(MANIFEST_FIELDS):
+            raise InvalidManifestException(
+                f"Box {number} has unknown fields: {', '.join(sorted(map(str, unknown)))}"
+            )
+        hostname = canonical_hostname(str(row["hostname"]))
+        if hostname in entries:
+            raise InvalidManifestException(f"{hostname} is listed more than once")
+        entries[hostname] = ManifestEntry(
+            hostname,
+            str(row.get("key") or ""),
+            str(row["ip_address"]) if row.get("ip_address") else None,
+        )
+    return list(entries.values())
+
+
+async def async_probe(
+    entry: ManifestEntry,
+    session: ClientSession | None = None,
+    zeroconf: Zeroconf | None = None,
+    timeout: float = 3,
+    key_validator: KeyValidator | None = None,
+) -> ProbeResult:
+    """Check that a box is reachable and accepts (one of) its key(s)."""
+    result = ProbeResult(entry)
+    device = MotionBlindsRS485Device(
+        f"{entry.hostname}.local",
+        use_ha=True,
+        session=session,
+        zeroconf=zeroconf,
+    )
+    try:
+        if entry.ip_address is not None:
+            device.set_ip_address(entry.ip_address, ttl=math.inf)
+        elif await device.resolve_address() is None:
+            result.error = "Not found"
+            return result
+        result.ip_address = device.ip_address
+        if not await device.ping(timeout=timeout):
+            result.error = "Unreachable"
+            return result
+        result.reachable = True
+        result.supports_batch = device.supports_batch
+        result.key = await (key_validator or KeyValidator()).async_find_key(
+            device, parse_keys(entry.key)
+        )
+        result.valid_key = result.key is not None
+        if not result.valid_key:
+            result.error = "Invalid key"
+    except (ClientError, asyncio.TimeoutError, AdmissionTimeoutException) as exception:
+        result.error = str(exception) or type(exception).__name__
+    finally:
+        await device.close()
+    return result
+
+
+async def async_probe_manifest(
+    entries: Iterable[ManifestEntry],
+    workers: int = DEFAULT_WORKERS,
+    session: ClientSession | None = None,
+    zeroconf: Zeroconf | None = None,
+    timeout: float = 3,
+    key_validator: KeyValidator | None = None,
+) -> list[ProbeResult]:
+    """Probe all boxes of a manifest, at most workers at the same time.
+
+    Results are in the order of the manifest.
+    """
+    entries = list(entries)
+    results: list[ProbeResult | None] = [None] * len(entries)
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for index in range(len(entries)):
+        queue.put_nowait(index)
+    owns_session = session is None
+    if owns_session:
+        # One pool of connections for all probes
+        session = ClientSession()
+
+    async def worker() -> None:
+        while not queue.empty():
+            index = queue.get_nowait()
+            results[index] = await async_probe(
+                entries[index], session, zeroconf, timeout, key_validator
+            )
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(workers, len(entries)))))
+    finally:
+        if owns_session:
+            await session.close()
+    return results
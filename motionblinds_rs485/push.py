@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientError, ClientResponseError, ClientTimeout, WSMsgType
+
+from .exceptions import AdmissionTimeoutException, NoAddressException
+
+if TYPE_CHECKING:
+    from .device import MotionBlindsRS485Device
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENTS_PATH = "/events"
+
+EVENT_SCENE_STARTED = "scene_started"
+EVENT_SCENE_FINISHED = "scene_finished"
+
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# Firmware without an events endpoint is asked again only this often
+UNSUPPORTED_BACKOFF = 3600.0
+HEARTBEAT = 30.0
+
+
+class PushUnsupportedException(Exception):
+    """Used to indicate the firmware has no events endpoint."""
+
+
+class PushChannel:
+    """Long-lived event stream from a box, over a WebSocket or server-sent events.
+
+    Reconnects with exponential backoff, events are passed to on_event. An
+    event that cannot be handled is logged and skipped, it does not end the
+    channel.
+    """
+
+    __slots__ = ("_device", "_on_event", "_task", "connected", "supported", "transport")
+
+    def __init__(
+        self,
+        device: MotionBlindsRS485Device,
+        on_event: Callable[[dict[str, Any]], None],
+    ) -> None:
+        self._device = device
+        self._on_event = on_event
+        self._task: asyncio.Task | None = None
+        self.connected = False
+        # None until the firmware was asked
+        self.supported: bool | None = None
+        self.transport: str | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    async def _run(self) -> None:
+        backoff = MIN_BACKOFF
+        while True:
+            try:
+                await self._connect()
+                # The connection was up, start over with a short backoff
+                backoff = MIN_BACKOFF
+            except PushUnsupportedException:
+                self.supported = False
+                backoff = UNSUPPORTED_BACKOFF
+            except (
+                ClientError,
+                asyncio.TimeoutError,
+                AdmissionTimeoutException,
+                NoAddressException,
+                ValueError,
+            ):
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception(
+                    "Unexpected error in the push channel of %s", self._device.hostname
+                )
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            finally:
+                self.connected = False
+            await asyncio.sleep(random.uniform(backoff / 2, backoff))
+
+    def _params(self) -> dict[str, str]:
+        return {"key": self._device.key} if self._device.key != "" else {}
+
+    async def _connect(self) -> None:
+        ip_address = await self._device._get_address()
+        url = f"http://{ip_address}{EVENTS_PATH}"
+        session = self._device._get_session()
+        # The channel takes one of the few sockets of the box, requests get
+        # one slot less while it is open
+        admission = self._device._admission
+        await admission.reserve()
+        try:
+            try:
+                await self._websocket(session, url)
+                return
+            except ClientResponseError as exception:
+                # No WebSocket upgrade, try server-sent events on the same path
+                if exception.status not in (400, 404, 405, 426):
+                    raise
+            await self._server_sent_events(session, url)
+        finally:
+            admission.unreserve()
+
+    async def _websocket(self, session, url: str) -> None:
+        async with session.ws_connect(
+            url, params=self._params(), heartbeat=HEARTBEAT
+        ) as websocket:
+            self._connected("websocket")
+            async for message in websocket:
+                if message.type == WSMsgType.TEXT:
+                    self._handle(message.data)
+                elif message.type in (WSMsgType.CLOSED, WSMsgType.ERROR):
+                    break
+
+    async def _server_sent_events(self, session, url: str) -> None:
+        async with session.get(
+            url,
+            params=self._params(),
+            headers={"Accept": "text/event-stream"},
+            timeout=ClientTimeout(total=None, sock_read=HEARTBEAT * 2),
+        ) as response:
+            if response.status == 404 or not response.content_type.startswith(
+                "text/event-stream"
+            ):
+                raise PushUnsupportedException
+            response.raise_for_status()
+            self._connected("sse")
+            async for line in response.content:
+                line = line.decode().strip()
+                if line.startswith("data:"):
+                    self._handle(line[len("data:") :])
+
+    def _handle(self, data: str) -> None:
+        try:
+            self._on_event(json.loads(data))
+        except Exception:  # pylint: disable=broad-except
+            # A malformed event or a failing listener, the next events may
+            # well be fine
+            _LOGGER.exception(
+                "Error handling event %r of %s", data, self._device.hostname
+            )
+
+    def _connected(self, transport: str) -> None:
+        self.connected = True
+        self.supported = True
+        self.transport = transport
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+
+from zeroconf import IPVersion, Zeroconf
+from zeroconf.asyncio import AsyncServiceInfo
+
+from .discovery import (
+    DEFAULT_TTL,
+    SERVICE_TYPE,
+    address_ttl,
+    format_address,
+    normalize_hostname,
+)
+
+
+async def async_resolve(
+    hostname: str, zeroconf: Zeroconf | None = None, timeout: float = 3
+) -> tuple[str, float] | None:
+    """Query the address of a box, returns the address and its TTL."""
+    hostname = normalize_hostname(hostname)
+    if zeroconf is not None:
+        # The service instance of a box is named after its hostname
+        info = AsyncServiceInfo(SERVICE_TYPE, f"{hostname}.{SERVICE_TYPE}")
+        if await info.async_request(zeroconf, timeout * 1000):
+            addresses = info.parsed_addresses(IPVersion.V4Only)
+            if len(addresses) != 0:
+                return format_address(addresses[0], info.port), address_ttl(info)
+    # Unicast DNS, or mDNS if the system resolver supports .local
+    try:
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(
+                f"{hostname}.local", 80, family=socket.AF_INET, type=socket.SOCK_STREAM
+            ),
+            timeout,
+        )
+    except (OSError, asyncio.TimeoutError):
+        return None
+    if len(infos) == 0:
+        return None
+    return infos[0][4][0], DEFAULT_TTL
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from aiohttp import ClientConnectorError, ClientError, ClientResponseError
+
+from .exceptions import (
+    AdmissionTimeoutException,
+    CircuitOpenException,
+    NoAddressException,
+    SerialTransportException,
+)
+
+_T = TypeVar("_T")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """Retry within an overall deadline with full jitter exponential backoff."""
+
+    deadline: float = 5.0
+    attempt_timeout: float = 3.0
+    base_delay: float = 0.1
+    max_delay: float = 1.0
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """Fail fast after repeated errors, let one probe through after reset_timeout."""
+
+    __slots__ = (
+        "failure_threshold",
+        "reset_timeout",
+        "failures",
+        "_opened_at",
+        "_probing",
+        "_listeners",
+    )
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener when the state changes, returns a function to remove it."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return STATE_CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return STATE_HALF_OPEN
+        return STATE_OPEN
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenException if the call should not be made."""
+        state = self.state
+        if state == STATE_OPEN or (state == STATE_HALF_OPEN and self._probing):
+            raise CircuitOpenException(
+                f"Refusing requests for {self.reset_timeout}s after"
+                f" {self.failures} errors"
+            )
+        if state == STATE_HALF_OPEN:
+            self._probing = True
+
+    def abort_call(self) -> None:
+        """The call was cancelled before its outcome was known."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        changed = self._opened_at is not None
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        if changed:
+            self._notify()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self._opened_at is not None or self.failures >= self.failure_threshold:
+            # A failed probe opens the circuit again for a full reset_timeout
+            self._opened_at = time.monotonic()
+            self._notify()
+
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            listener()
+
+
+def is_transport_error(exception: BaseException) -> bool:
+    """Whether the box could not be reached, as opposed to it answering an error."""
+    if isinstance(exception, ClientResponseError):
+        return exception.status >= 500
+    return isinstance(
+        exception,
+        (
+            ClientError,
+            asyncio.TimeoutError,
+            NoAddressException,
+            SerialTransportException,
+        ),
+    )
+
+
+def is_retryable(exception: BaseException, idempotent: bool) -> bool:
+    # Nothing reached the box when connecting failed, always safe to repeat
+    if isinstance(exception, (ClientConnectorError, NoAddressException)):
+        return True
+    return idempotent and is_transport_error(exception)
+
+
+async def call_with_retry(
+    func: Callable[[float], Awaitable[_T]],
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+    idempotent: bool,
+) -> _T:
+    """Call func(timeout) until it succeeds, fails for good or the deadline passes.
+
+    func must keep to timeout, including any time it waits for admission.
+    """
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        breaker.before_call()
+        timeout = min(policy.attempt_timeout, deadline - time.monotonic())
+        try:
+            result = await func(timeout)
+        except asyncio.CancelledError:
+            breaker.abort_call()
+            raise
+        except AdmissionTimeoutException:
+            # Nothing was sent, the box is busy rather than unreachable
+            breaker.abort_call()
+            if time.monotonic() >= deadline:
+                raise
+        except Exception as exception:  # pylint: disable=broad-except
+            if not is_transport_error(exception):
+                # The box answered
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            delay = policy.delay(attempt)
+            attempt += 1
+            if (
+                not is_retryable(exception, idempotent)
+                or time.monotonic() + delay >= deadline
+            ):
+                raise
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
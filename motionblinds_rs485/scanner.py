@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import socket
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+
+from .discovery import canonical_hostname, format_address
+
+DEFAULT_CONCURRENCY = 256
+# Boxes answer on the LAN in milliseconds, nothing answers from most addresses
+DEFAULT_CONNECT_TIMEOUT = 0.5
+DEFAULT_TIMEOUT = 2.0
+# A /16
+MAX_SCAN_ADDRESSES = 65536
+
+
+@dataclass(slots=True)
+class ScanResult:
+    address: str
+    # From the box itself or reverse DNS, None when neither knows it
+    hostname: str | None = None
+    supports_batch: bool = False
+
+
+def scan_addresses(networks: str | Iterable[str]) -> list[str]:
+    """Host addresses of CIDR ranges, e.g. 10.0.0.0/22, raises ValueError."""
+    if isinstance(networks, str):
+        networks = [networks]
+    addresses: dict[str, None] = {}
+    for network in networks:
+        parsed = ipaddress.ip_network(network.strip(), strict=False)
+        if parsed.version != 4:
+            raise ValueError(f"Only IPv4 networks can be scanned: {network}")
+        if len(addresses) + parsed.num_addresses > MAX_SCAN_ADDRESSES:
+            raise ValueError(f"More than {MAX_SCAN_ADDRESSES} addresses to scan")
+        # Without the network and broadcast addresses
+        addresses.update(dict.fromkeys(str(address) for address in parsed.hosts()))
+    return list(addresses)
+
+
+def root_hostname(json: dict[str, Any]) -> str | None:
+    """Hostname of a box from the answer of its root endpoint, None if not in it."""
+    if isinstance(hostname := json.get("hostname"), str):
+        return canonical_hostname(hostname)
+    if isinstance(mac := json.get("mac"), str):
+        return canonical_hostname(
+            "motionblinds-rs485-" + mac.replace(":", "").replace("-", "")
+        )
+    return None
+
+
+async def _reverse_lookup(ip_address: str, timeout: float) -> str | None:
+    try:
+        hostname, _ = await asyncio.wait_for(
+            asyncio.get_running_loop().getnameinfo(
+                (ip_address, 0), socket.NI_NAMEREQD
+            ),
+            timeout,
+        )
+    except (OSError, asyncio.TimeoutError):
+        return None
+    # Only the first label, the DHCP server adds its own domain
+    return canonical_hostname(hostname.split(".")[0])
+
+
+async def async_probe_address(
+    session: ClientSession,
+    address: str,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> ScanResult | None:
+    """Whether a Domotica Box answers on address, None if not.
+
+    The root endpoint of a box answers JSON with status "ok", anything else
+    on the address is not a box.
+    """
+    try:
+        async with session.get(
+            f"http://{address}/",
+            timeout=ClientTimeout(total=timeout, sock_connect=connect_timeout),
+            allow_redirects=False,
+        ) as response:
+            # Do not download the web pages of everything else on the network
+            if response.status != 200 or response.content_type != "application/json":
+                return None
+            json = await response.json()
+    except (ClientError, asyncio.TimeoutError, ValueError):
+        return None
+    if not isinstance(json, dict) or json.get("status") != "ok":
+        return None
+    return ScanResult(
+        address,
+        root_hostname(json),
+        "batch" in json.get("features", []),
+    )
+
+
+async def _async_probe_all(
+    addresses: list[str],
+    port: int,
+    concurrency: int,
+    connect_timeout: float,
+    timeout: float,
+    on_found: Callable[[ScanResult], bool],
+) -> None:
+    """Probe addresses, stopping early when on_found returns True."""
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for address in addresses:
+        queue.put_nowait(address)
+
+    async def worker(session: ClientSession) -> None:
+        while not queue.empty():
+            address = queue.get_nowait()
+            result = await async_probe_address(
+                session, format_address(address, port), connect_timeout, timeout
+            )
+            if result is None:
+                continue
+            if result.hostname is None:
+                result.hostname = await _reverse_lookup(address, timeout)
+            if on_found(result):
+                # Probes already running finish, nothing else is started
+                while not queue.empty():
+                    queue.get_nowait()
+
+    # A session of its own, the probes would otherwise fill the connection
+    # pool shared with everything else. Nothing is reused between addresses.
+    async with ClientSession(
+        connector=TCPConnector(limit=concurrency, force_close=True)
+    ) as session:
+        await asyncio.gather(
+            *(worker(session) for _ in range(min(concurrency, len(addresses))))
+        )
+
+
+async def async_scan(
+    networks: str | Iterable[str],
+    port: int = 80,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    timeout: float = DEFAULT_TIMEOUT,
+    on_found: Callable[[ScanResult], None] | None = None,
+) -> list[ScanResult]:
+    """Find Domotica Boxes in CIDR ranges without mDNS, e.g. across VLANs.
+
+    At most concurrency addresses are probed at the same time, each with a
+    short connect timeout, so a /22 takes a few seconds even when most
+    addresses do not answer. Boxes that do not tell their hostname are looked
+    up in reverse DNS. Results are in address order.
+    """
+    addresses = scan_addresses(networks)
+    found: dict[str, ScanResult] = {}
+
+    def found_one(result: ScanResult) -> bool:
+        found[result.address] = result
+        if on_found is not None:
+            on_found(result)
+        return False
+
+    await _async_probe_all(
+        addresses, port, concurrency, connect_timeout, timeout, found_one
+    )
+    return [
+        found[address]
+        for address in (format_address(address, port) for address in addresses)
+        if address in found
+    ]
+
+
+async def async_locate(
+    hostname: str,
+    networks: str | Iterable[str],
+    port: int = 80,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> ScanResult | None:
+    """Find one box in CIDR ranges, e.g. after it got another address on a VLAN.
+
+    Like async_scan, but stops at the first address answering with hostname.
+    """
+    hostname = canonical_hostname(hostname)
+    located: list[ScanResult] = []
+
+    def found_one(result: ScanResult) -> bool:
+        if result.hostname is None or canonical_hostname(result.hostname) != hostname:
+            return False
+        located.append(result)
+        return True
+
+    await _async_probe_all(
+        scan_addresses(networks), port, concurrency, connect_timeout, timeout, found_one
+    )
+    return located[0] if located else None
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import socket
+import tty
+from typing import Any
+
+from aiohttp import web
+from zeroconf import IPVersion
+from zeroconf.asyncio import AsyncServiceInfo, AsyncZeroconf
+
+from .device import FEATURE_BATCH
+from .discovery import SERVICE_TYPE
+from .exceptions import InvalidFrameException
+from .frames import FRAME_LENGTH, FRAME_START, parse_frame
+from .push import EVENT_SCENE_FINISHED, EVENT_SCENE_STARTED, EVENTS_PATH
+
+
+class MotionBlindsRS485Simulator:
+    """Local mock of the HTTP API of a Domotica Box.
+
+    Responses can be delayed, fail at random (HTTP 500) or be rejected as
+    having an invalid key. Like the ESP32, it drops connections beyond
+    max_connections simultaneous requests. It can advertise itself over mDNS
+    on loopback, and push scene_started/scene_finished events over a WebSocket
+    or server-sent events on /events.
+    """
+
+    runner: web.AppRunner | None = None
+    aiozc: AsyncZeroconf | None = None
+    service_info: AsyncServiceInfo | None = None
+
+    def __init__(
+        self,
+        key: str = "",
+        latency: float = 0.0,
+        batch: bool = True,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        hostname: str = "motionblinds-rs485-000000000000",
+        error_rate: float = 0.0,
+        invalid_key_rate: float = 0.0,
+        max_connections: int | None = None,
+        seed: int | None = None,
+        push: str | None = "websocket",
+        scene_duration: float = 1.0,
+        root_checks_key: bool = False,
+    ) -> None:
+        self.key = key
+        self.latency = latency
+        self.batch = batch
+        self.host = host
+        self.port = port
+        self.hostname = hostname
+        self.error_rate = error_rate
+        self.invalid_key_rate = invalid_key_rate
+        self.max_connections = max_connections
+        self._random = random.Random(seed)
+        self._in_flight = 0
+        self.push = push
+        self.scene_duration = scene_duration
+        # Whether real firmware checks a key given to the root endpoint is
+        # not known, so by default it is ignored there
+        self.root_checks_key = root_checks_key
+        self._subscribers: set[asyncio.Queue] = set()
+        self._scene_tasks: set[asyncio.Task] = set()
+        # Every scene command received, in order
+        self.received: list[tuple[str, int]] = []
+        self.requests = 0
+        self.rejected = 0
+
+    @property
+    def address(self) -> str:
+        """Address to give to MotionBlindsRS485Device.set_ip_address."""
+        return f"{self.host}:{self.port}"
+
+    async def start(self, advertise: bool = False) -> str:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/", self._handle_root)
+        app.router.add_get("/start", self._handle_scene)
+        app.router.add_get("/stop", self._handle_scene)
+        if self.push is not None:
+            app.router.add_get(EVENTS_PATH, self._handle_events)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        # Port 0 lets the OS pick one
+        self.port = site._server.sockets[0].getsockname()[1]
+        if advertise:
+            await self.advertise()
+        return self.address
+
+    async def advertise(self, aiozc: AsyncZeroconf | None = None) -> None:
+        """Announce the simulator over mDNS, on loopback unless aiozc is given."""
+        self.aiozc = aiozc or AsyncZeroconf(
+            interfaces=[self.host], ip_version=IPVersion.V4Only
+        )
+        self.service_info = AsyncServiceInfo(
+            SERVICE_TYPE,
+            f"{self.hostname}.{SERVICE_TYPE}",
+            addresses=[socket.inet_aton(self.host)],
+            port=self.port,
+            server=f"{self.hostname}.local.",
+        )
+        await self.aiozc.async_register_service(self.service_info)
+
+    async def stop(self) -> None:
+        for task in self._scene_tasks:
+            task.cancel()
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        if self.aiozc is not None and self.service_info is not None:
+            await self.aiozc.async_unregister_service(self.service_info)
+            await self.aiozc.async_close()
+            self.aiozc = None
+            self.service_info = None
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        self.requests += 1
+        if self.max_connections is not None and self._in_flight >= self.max_connections:
+            # The ESP32 has no room for another socket
+            self.rejected += 1
+            request.transport.close()
+            raise web.HTTPServiceUnavailable()
+        self._in_flight += 1
+        try:
+            if self.latency > 0:
+                await asyncio.sleep(self.latency)
+            if self._random.random() < self.error_rate:
+                return web.json_response(
+                    {"status": "error", "message": "internal error"}, status=500
+                )
+            return await handler(request)
+        finally:
+            self._in_flight -= 1
+
+    def _respond(self, status: str = "ok", **data) -> web.Response:
+        return web.json_response({"status": status, **data})
+
+    async def _handle_root(self, request: web.Request) -> web.Response:
+        if self.root_checks_key and request.query.get("key", self.key) != self.key:
+            return self._respond("error", message="invalid key")
+        return self._respond(
+            hostname=self.hostname, features=[FEATURE_BATCH] if self.batch else []
+        )
+
+    async def _handle_scene(self, request: web.Request) -> web.Response:
+        if (
+            request.query.get("key", "") != self.key
+            or self._random.random() < self.invalid_key_rate
+        ):
+            return self._respond("error", message="invalid key")
+        if "scene" in request.query:
+            scenes = [request.query["scene"]]
+        elif self.batch and "scenes" in request.query:
+            scenes = request.query["scenes"].split(",")
+        else:
+            # Assumed, not checked on real firmware
+            return self._respond("error", message="missing scene")
+        command = request.path.lstrip("/")
+        self.received.extend((command, int(scene)) for scene in scenes)
+        for scene in scenes:
+            if command == "start":
+                task = asyncio.get_running_loop().create_task(self._run_scene(int(scene)))
+                self._scene_tasks.add(task)
+                task.add_done_callback(self._scene_tasks.discard)
+            else:
+                self._publish(EVENT_SCENE_FINISHED, int(scene))
+        return self._respond()
+
+    def _publish(self, event: str, scene: int) -> None:
+        self.push_event({"event": event, "scene": scene})
+
+    def push_event(self, event: Any) -> None:
+        """Send event to the connected push channels as is, e.g. a malformed one."""
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    async def _run_scene(self, scene: int) -> None:
+        self._publish(EVENT_SCENE_STARTED, scene)
+        await asyncio.sleep(self.scene_duration)
+        self._publish(EVENT_SCENE_FINISHED, scene)
+
+    async def _handle_events(self, request: web.Request) -> web.StreamResponse:
+        if request.query.get("key", "") != self.key:
+            raise web.HTTPForbidden()
+        is_websocket = request.headers.get("Upgrade", "").lower() == "websocket"
+        if is_websocket != (self.push == "websocket"):
+            raise web.HTTPNotFound()
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        try:
+            if is_websocket:
+                response = web.WebSocketResponse()
+                await response.prepare(request)
+                while (event := await queue.get()) is not None:
+                    await response.send_json(event)
+                await response.close()
+            else:
+                response = web.StreamResponse(
+                    headers={"Content-Type": "text/event-stream"}
+                )
+                await response.prepare(request)
+                while (event := await queue.get()) is not None:
+                    await response.write(f"data: {json.dumps(event)}\n\n".encode())
+            return response
+        finally:
+            self._subscribers.discard(queue)
+
+
+class SerialBusSimulator:
+    """Pseudo-terminal standing in for a USB-RS485 adapter on a bus.
+
+    Give port to SerialTransport. Scene frames written to it are parsed and
+    recorded in received, like the scene commands of the box simulator.
+    Unix only.
+    """
+
+    def __init__(self) -> None:
+        self.port: str | None = None
+        self._master: int | None = None
+        self._slave: int | None = None
+        self._buffer = bytearray()
+        # Every scene frame received, in order
+        self.received: list[tuple[str, int]] = []
+        self.invalid_bytes = 0
+        self._received_event = asyncio.Event()
+
+    async def start(self) -> str:
+        self._master, self._slave = os.openpty()
+        # Bytes as written, no newline translation
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        asyncio.get_running_loop().add_reader(self._master, self._read)
+        # The slave stays open here, so the pty survives the transport
+        # closing and opening it again
+        self.port = os.ttyname(self._slave)
+        return self.port
+
+    async def stop(self) -> None:
+        if self._master is not None:
+            asyncio.get_running_loop().remove_reader(self._master)
+            os.close(self._master)
+            os.close(self._slave)
+            self._master = self._slave = None
+
+    async def wait_for(self, count: int, timeout: float = 1.0) -> None:
+        """Wait until count frames were received in total."""
+
+        async def wait() -> None:
+            while len(self.received) < count:
+                self._received_event.clear()
+                await self._received_event.wait()
+
+        await asyncio.wait_for(wait(), timeout)
+
+    def _read(self) -> None:
+        try:
+            self._buffer += os.read(self._master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        while len(self._buffer) >= FRAME_LENGTH:
+            if self._buffer[0] != FRAME_START:
+                # Resynchronize on the next start byte
+                self.invalid_bytes += 1
+                del self._buffer[0]
+                continue
+            try:
+                frame = parse_frame(bytes(self._buffer[:FRAME_LENGTH]))
+            except InvalidFrameException:
+                self.invalid_bytes += 1
+                del self._buffer[0]
+                continue
+            del self._buffer[:FRAME_LENGTH]
+            self.received.append(frame)
+            self._received_event.set()
@@ -1 +0,0 @@
-print(list(str(x) for x in range(1, 15)))
@@ -0,0 +1,86 @@
+import asyncio
+
+from motionblinds_rs485.admission import AdmissionController, TokenBucket
+
+
+def test_token_bucket_burst_then_rate(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr("motionblinds_rs485.admission.time.monotonic", lambda: now)
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_take()
+    assert bucket.try_take()
+    assert not bucket.try_take()
+    assert abs(bucket.delay() - 0.1) < 1e-9
+    now += 0.15
+    assert bucket.try_take()
+    assert not bucket.try_take()
+
+
+def test_round_robin_over_boxes():
+    """A box with many queued requests does not starve the others."""
+
+    async def run() -> list[str]:
+        controller = AdmissionController(global_limit=1, rate=None)
+        busy, quiet = controller.box("busy"), controller.box("quiet")
+        order: list[str] = []
+
+        async def request(name: str, box) -> None:
+            await box.acquire()
+            order.append(name)
+            await asyncio.sleep(0)
+            box.release()
+
+        await busy.acquire()
+        tasks = [
+            asyncio.create_task(request("busy-1", busy)),
+            asyncio.create_task(request("busy-2", busy)),
+            asyncio.create_task(request("busy-3", busy)),
+        ]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("quiet-1", quiet)))
+        await asyncio.sleep(0)
+        busy.release()
+        await asyncio.gather(*tasks)
+        assert controller.in_flight == 0
+        return order
+
+    assert asyncio.run(run()) == ["busy-1", "quiet-1", "busy-2", "busy-3"]
+
+
+def test_per_box_limit_and_reserved_slot():
+    async def run() -> None:
+        controller = AdmissionController(per_box_limit=2, rate=None)
+        box = controller.box("box")
+        # The push channel holds one of the two slots
+        await box.reserve()
+        assert (box.reserved, box.in_flight, controller.in_flight) == (1, 0, 0)
+        await box.acquire()
+        assert not box.has_free_slot
+        waiter = asyncio.create_task(box.acquire())
+        await asyncio.sleep(0)
+        assert box.waiting == 1
+        box.unreserve()
+        await asyncio.wait_for(waiter, 1)
+        assert (box.reserved, box.in_flight) == (0, 2)
+        box.release()
+        box.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_is_dropped():
+    async def run() -> None:
+        controller = AdmissionController(per_box_limit=1, rate=None)
+        box = controller.box("box")
+        await box.acquire()
+        waiter = asyncio.create_task(box.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert box.waiting == 0
+        box.release()
+        assert controller.in_flight == 0
+        assert box.in_flight == 0
+
+    asyncio.run(run())
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from motionblinds_rs485.command_queue import (
+    CommandQueue,
+    CommandQueueFullException,
+    CommandSupersededException,
+)
+
+
+class Box:
+    """Records the commands sent, each waits until released."""
+
+    def __init__(self) -> None:
+        self.sent: list[tuple[str, tuple[int, ...]]] = []
+        self.release = asyncio.Event()
+
+    async def send(self, command: str, scenes: tuple[int, ...]) -> None:
+        self.sent.append((command, scenes))
+        await self.release.wait()
+
+
+def test_equal_commands_are_coalesced():
+    async def run() -> None:
+        box = Box()
+        queue = CommandQueue(box.send)
+        first = asyncio.create_task(queue.submit("start", (1,)))
+        await asyncio.sleep(0)
+        # Waiting behind the one being sent
+        second = asyncio.create_task(queue.submit("stop", (2,)))
+        third = asyncio.create_task(queue.submit("stop", (2,)))
+        await asyncio.sleep(0)
+        box.release.set()
+        assert await asyncio.gather(first, second, third) == [None, None, None]
+        assert box.sent == [("start", (1,)), ("stop", (2,))]
+        assert queue.coalesced == 1
+
+    asyncio.run(run())
+
+
+def test_opposite_command_supersedes():
+    async def run() -> None:
+        box = Box()
+        queue = CommandQueue(box.send)
+        first = asyncio.create_task(queue.submit("start", (1,)))
+        await asyncio.sleep(0)
+        start = asyncio.create_task(queue.submit("start", (3,)))
+        await asyncio.sleep(0)
+        stop = asyncio.create_task(queue.submit("stop", (3,)))
+        await asyncio.sleep(0)
+        box.release.set()
+        await first
+        with pytest.raises(CommandSupersededException):
+            await start
+        assert await stop is None
+        assert box.sent == [("start", (1,)), ("stop", (3,))]
+        assert queue.superseded == 1
+
+    asyncio.run(run())
+
+
+def test_overlapping_commands_keep_the_last_writer_per_scene():
+    async def run() -> None:
+        box = Box()
+        queue = CommandQueue(box.send)
+        first = asyncio.create_task(queue.submit("start", (5,)))
+        await asyncio.sleep(0)
+        start = asyncio.create_task(queue.submit("start", (1, 2)))
+        await asyncio.sleep(0)
+        stop = asyncio.create_task(queue.submit("stop", (2,)))
+        await asyncio.sleep(0)
+        # Must not share the result of the first start, that would send it
+        # before the stop
+        start_again = asyncio.create_task(queue.submit("start", (1, 2)))
+        await asyncio.sleep(0)
+        box.release.set()
+        await first
+        assert await start is None
+        with pytest.raises(CommandSupersededException):
+            await stop
+        assert await start_again is None
+        assert box.sent == [("start", (5,)), ("start", (1,)), ("start", (1, 2))]
+        assert queue.superseded == 1
+        assert queue.coalesced == 0
+
+    asyncio.run(run())
+
+
+def test_partly_superseded_command_sends_the_other_scenes():
+    async def run() -> None:
+        box = Box()
+        queue = CommandQueue(box.send)
+        first = asyncio.create_task(queue.submit("start", (5,)))
+        await asyncio.sleep(0)
+        start = asyncio.create_task(queue.submit("start", (1, 2)))
+        await asyncio.sleep(0)
+        stop = asyncio.create_task(queue.submit("stop", (2,)))
+        await asyncio.sleep(0)
+        box.release.set()
+        await asyncio.gather(first, start, stop)
+        assert box.sent == [("start", (5,)), ("start", (1,)), ("stop", (2,))]
+        assert queue.superseded == 0
+
+    asyncio.run(run())
+
+
+def test_commands_are_sent_in_order_one_at_a_time():
+    async def run() -> None:
+        box = Box()
+        box.release.set()
+        queue = CommandQueue(box.send)
+        await asyncio.gather(
+            *(queue.submit("start", (scene,)) for scene in range(1, 5))
+        )
+        assert box.sent == [("start", (scene,)) for scene in range(1, 5)]
+
+    asyncio.run(run())
+
+
+def test_failure_reaches_the_caller():
+    async def send(command: str, scenes: tuple[int, ...]) -> None:
+        raise OSError("unreachable")
+
+    async def run() -> None:
+        with pytest.raises(OSError):
+            await CommandQueue(send).submit("start", (1,))
+
+    asyncio.run(run())
+
+
+def test_full_queue_is_rejected():
+    async def run() -> None:
+        box = Box()
+        queue = CommandQueue(box.send, max_depth=1)
+        first = asyncio.create_task(queue.submit("start", (1,)))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(queue.submit("start", (2,)))
+        await asyncio.sleep(0)
+        with pytest.raises(CommandQueueFullException):
+            await queue.submit("start", (3,))
+        box.release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(run())
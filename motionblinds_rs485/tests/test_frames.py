@@ -0,0 +1,43 @@
+import pytest
+
+from motionblinds_rs485.exceptions import InvalidFrameException
+from motionblinds_rs485.frames import (
+    FRAME_LENGTH,
+    build_scene_frame,
+    build_scene_frames,
+    crc16,
+    parse_frame,
+)
+
+
+def test_crc16_modbus_check_value():
+    # The standard check value of CRC-16/MODBUS
+    assert crc16(b"123456789") == 0x4B37
+
+
+@pytest.mark.parametrize("command", ["start", "stop"])
+@pytest.mark.parametrize("scene", [1, 8, 15])
+def test_round_trip(command, scene):
+    frame = build_scene_frame(command, scene)
+    assert len(frame) == FRAME_LENGTH
+    assert crc16(frame) == 0
+    assert parse_frame(frame) == (command, scene)
+
+
+def test_frames_are_written_back_to_back():
+    frames = build_scene_frames("stop", (1, 2))
+    assert parse_frame(frames[:FRAME_LENGTH]) == ("stop", 1)
+    assert parse_frame(frames[FRAME_LENGTH:]) == ("stop", 2)
+
+
+def test_bad_checksum_is_rejected():
+    frame = bytearray(build_scene_frame("start", 3))
+    frame[4] = 4
+    with pytest.raises(InvalidFrameException):
+        parse_frame(bytes(frame))
+
+
+@pytest.mark.parametrize(("command", "scene"), [("open", 1), ("start", 0), ("start", 16)])
+def test_invalid_command_or_scene(command, scene):
+    with pytest.raises(ValueError):
+        build_scene_frame(command, scene)
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from motionblinds_rs485.device import MotionBlindsRS485Device
+from motionblinds_rs485.keys import KeyValidator, parse_keys
+from motionblinds_rs485.simulator import MotionBlindsRS485Simulator
+
+
+async def with_box(simulator: MotionBlindsRS485Simulator, check) -> None:
+    await simulator.start()
+    device = MotionBlindsRS485Device("motionblinds-rs485-000000000000", use_ha=True)
+    device.set_ip_address(simulator.address)
+    try:
+        await check(device)
+    finally:
+        await device.close()
+        await simulator.stop()
+
+
+def test_parse_keys():
+    assert parse_keys(" a, b,,a ") == ["a", "b"]
+    assert parse_keys("") == [""]
+
+
+@pytest.mark.parametrize("key", ["", "secret", "wrong"])
+def test_validation_never_reaches_the_motors(key):
+    simulator = MotionBlindsRS485Simulator(key="secret", push=None)
+
+    async def check(device) -> None:
+        # The root endpoint of this box does not check keys
+        assert await device.validate_key(key)
+
+    asyncio.run(with_box(simulator, check))
+    assert simulator.received == []
+
+
+def test_rejected_key():
+    simulator = MotionBlindsRS485Simulator(key="secret", push=None, root_checks_key=True)
+
+    async def check(device) -> None:
+        assert not await device.validate_key("wrong")
+        assert await device.validate_key("secret")
+
+    asyncio.run(with_box(simulator, check))
+    assert simulator.received == []
+
+
+def test_find_key_among_candidates_is_cached():
+    simulator = MotionBlindsRS485Simulator(key="secret", push=None, root_checks_key=True)
+    validator = KeyValidator()
+
+    async def check(device) -> None:
+        assert await validator.async_find_key(device, ["a", "secret", "b"]) == "secret"
+        requests = simulator.requests
+        assert await validator.async_find_key(device, ["a", "secret", "b"]) == "secret"
+        assert simulator.requests == requests
+        assert await validator.async_find_key(device, ["a", "b"]) is None
+
+    asyncio.run(with_box(simulator, check))
+    assert validator.hits >= 1
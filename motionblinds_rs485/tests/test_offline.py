@@ -0,0 +1,64 @@
+import pytest
+
+from motionblinds_rs485.offline import OfflineBuffer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("motionblinds_rs485.offline.time.monotonic", lambda: clock[0])
+    return clock
+
+
+def test_last_command_per_scene_wins(clock):
+    buffer = OfflineBuffer()
+    buffer.add("start", (1, 2))
+    buffer.add("stop", (1,))
+    assert buffer.depth == 2
+    assert buffer.superseded == 1
+    assert {(command, scenes) for command, scenes, _ in buffer.take()} == {
+        ("start", (2,)),
+        ("stop", (1,)),
+    }
+
+
+def test_take_keeps_order_and_groups_scenes(clock):
+    buffer = OfflineBuffer()
+    buffer.add("start", (3,))
+    clock[0] += 1
+    buffer.add("start", (1,))
+    clock[0] += 1
+    buffer.add("stop", (2,))
+    clock[0] += 1
+    buffer.add("start", (4,))
+    assert buffer.take() == [
+        ("start", (3, 1), 100.0),
+        ("stop", (2,), 102.0),
+        ("start", (4,), 103.0),
+    ]
+    assert buffer.depth == 0
+
+
+def test_old_commands_expire(clock):
+    buffer = OfflineBuffer(max_age=300)
+    buffer.add("start", (1,))
+    clock[0] += 200
+    buffer.add("start", (2,))
+    clock[0] += 101
+    assert buffer.take() == [("start", (2,), 300.0)]
+    assert buffer.expired == 1
+    assert buffer.dropped == 1
+
+
+def test_requeue_does_not_override_newer_commands(clock):
+    buffer = OfflineBuffer()
+    buffer.add("start", (1, 2))
+    taken = buffer.take()
+    # Came in while the taken ones were being sent
+    buffer.add("stop", (2,))
+    buffer.requeue(taken)
+    assert buffer.superseded == 1
+    assert sorted((command, scenes) for command, scenes, _ in buffer.take()) == [
+        ("start", (1,)),
+        ("stop", (2,)),
+    ]
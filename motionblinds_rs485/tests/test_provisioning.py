@@ -0,0 +1,43 @@
+import pytest
+
+from motionblinds_rs485.provisioning import (
+    InvalidManifestException,
+    ManifestEntry,
+    parse_manifest,
+)
+
+HOSTNAME = "motionblinds-rs485-D4D4DA8512FC"
+
+
+def test_csv():
+    manifest = f"hostname,key,ip_address\n{HOSTNAME}, secret, 10.15.3.32\n"
+    assert parse_manifest(manifest) == [
+        ManifestEntry(HOSTNAME, "secret", "10.15.3.32")
+    ]
+
+
+def test_yaml_list_and_mapping():
+    assert parse_manifest(f"- hostname: {HOSTNAME}\n  key: a,b\n") == [
+        ManifestEntry(HOSTNAME, "a,b")
+    ]
+    assert parse_manifest(f"{HOSTNAME}:\n  key: secret\n") == [
+        ManifestEntry(HOSTNAME, "secret")
+    ]
+    assert parse_manifest(f"{HOSTNAME}:\n") == [ManifestEntry(HOSTNAME)]
+
+
+@pytest.mark.parametrize(
+    "manifest",
+    [
+        f"{HOSTNAME}: secret\n",
+        f"{HOSTNAME}: [secret]\n",
+        "just text",
+        "- key: secret\n",
+        f"- hostname: {HOSTNAME}\n  port: 80\n",
+        f"- hostname: {HOSTNAME}\n- hostname: {HOSTNAME}\n",
+        "- [unclosed\n",
+    ],
+)
+def test_invalid_manifest(manifest):
+    with pytest.raises(InvalidManifestException):
+        parse_manifest(manifest)
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from motionblinds_rs485.device import MotionBlindsRS485Device
+from motionblinds_rs485.push import EVENT_SCENE_FINISHED, EVENT_SCENE_STARTED
+from motionblinds_rs485.simulator import MotionBlindsRS485Simulator
+
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr("motionblinds_rs485.push.MIN_BACKOFF", 0.02)
+
+
+async def wait_until(condition, timeout: float = 2.0) -> None:
+    async def wait() -> None:
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), timeout)
+
+
+@pytest.mark.parametrize("push", ["websocket", "sse"])
+def test_events_after_malformed_ones_and_a_reconnect(push):
+    async def run() -> None:
+        simulator = MotionBlindsRS485Simulator(push=push, scene_duration=0.05)
+        await simulator.start()
+        device = MotionBlindsRS485Device("motionblinds-rs485-000000000000", use_ha=True)
+        device.set_ip_address(simulator.address)
+        events = []
+
+        def listener(event) -> None:
+            if event.get("event") == "other":
+                raise RuntimeError("listener failed")
+            events.append(event)
+
+        device.add_event_listener(listener)
+        device.start_push()
+        try:
+            await wait_until(lambda: device.push.connected)
+            assert device.push.transport == push
+            # Missing its scene, not an object, and then a failing listener
+            simulator.push_event({"event": EVENT_SCENE_STARTED})
+            simulator.push_event(["not", "an", "event"])
+            simulator.push_event({"event": "other"})
+            await device.start(1)
+            await wait_until(lambda: 1 not in device.running_scenes and len(events) == 2)
+            assert events == [
+                {"event": EVENT_SCENE_STARTED, "scene": 1},
+                {"event": EVENT_SCENE_FINISHED, "scene": 1},
+            ]
+
+            # The box restarts on the same address
+            port = simulator.port
+            await simulator.stop()
+            await wait_until(lambda: not device.push.connected)
+            simulator = MotionBlindsRS485Simulator(
+                push=push, port=port, scene_duration=0.05
+            )
+            await simulator.start()
+            await wait_until(lambda: device.push.connected)
+            await device.start(2)
+            await wait_until(lambda: len(events) == 4)
+            assert events[2:] == [
+                {"event": EVENT_SCENE_STARTED, "scene": 2},
+                {"event": EVENT_SCENE_FINISHED, "scene": 2},
+            ]
+        finally:
+            await device.close()
+            await simulator.stop()
+
+    asyncio.run(run())
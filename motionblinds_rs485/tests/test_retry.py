@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from motionblinds_rs485.exceptions import CircuitOpenException
+from motionblinds_rs485.retry import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    RetryPolicy,
+    call_with_retry,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("motionblinds_rs485.retry.time.monotonic", lambda: clock[0])
+    return clock
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenException):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    changes = []
+    breaker.add_listener(lambda: changes.append(breaker.state))
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenException):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert changes == [STATE_OPEN, STATE_CLOSED]
+
+
+def test_failed_probe_opens_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    clock[0] += 29
+    assert breaker.state == STATE_OPEN
+
+
+def test_aborted_probe_frees_half_open(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.before_call()
+    breaker.abort_call()
+    breaker.before_call()
+
+
+def test_retries_transport_errors_until_success():
+    attempts = []
+
+    async def func(timeout: float) -> str:
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise asyncio.TimeoutError
+        return "ok"
+
+    breaker = CircuitBreaker()
+    policy = RetryPolicy(deadline=5, base_delay=0.001, max_delay=0.001)
+    assert asyncio.run(call_with_retry(func, policy, breaker, idempotent=True)) == "ok"
+    assert len(attempts) == 3
+    assert breaker.failures == 0
+
+
+def test_does_not_retry_non_idempotent_timeouts():
+    attempts = []
+
+    async def func(timeout: float) -> None:
+        attempts.append(timeout)
+        raise asyncio.TimeoutError
+
+    policy = RetryPolicy(deadline=5, base_delay=0.001, max_delay=0.001)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_retry(func, policy, CircuitBreaker(), idempotent=False))
+    assert len(attempts) == 1
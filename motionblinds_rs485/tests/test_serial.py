@@ -0,0 +1,53 @@
+import asyncio
+import sys
+
+import pytest
+
+from motionblinds_rs485.device import MotionBlindsRS485Device
+from motionblinds_rs485.exceptions import SerialTransportException
+from motionblinds_rs485.simulator import SerialBusSimulator
+from motionblinds_rs485.transport import SerialTransport, serial_hostname
+
+pytest.importorskip("serial_asyncio_fast")
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="needs a pty")
+
+
+def test_refused_while_frames_are_unverified():
+    with pytest.raises(SerialTransportException):
+        SerialTransport("/dev/ttyUSB0")
+
+
+def test_commands_reach_the_bus():
+    async def run() -> None:
+        bus = SerialBusSimulator()
+        port = await bus.start()
+        device = MotionBlindsRS485Device(
+            serial_hostname(port),
+            use_ha=True,
+            transport=SerialTransport(port, unverified_frames=True),
+        )
+        try:
+            assert await device.ping()
+            assert await device.start(3)
+            assert await device.stop_many([1, 2])
+            await bus.wait_for(3)
+        finally:
+            await device.close()
+            await bus.stop()
+        assert bus.received == [("start", 3), ("stop", 1), ("stop", 2)]
+        assert bus.invalid_bytes == 0
+        assert device.metrics.as_dict()["requests"] == 2
+
+    asyncio.run(run())
+
+
+def test_missing_port_is_not_reachable():
+    async def run() -> None:
+        transport = SerialTransport("/dev/does-not-exist", unverified_frames=True)
+        device = MotionBlindsRS485Device("rs485-missing", use_ha=True, transport=transport)
+        try:
+            assert not await device.ping(timeout=1)
+        finally:
+            await device.close()
+
+    asyncio.run(run())
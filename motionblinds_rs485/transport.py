@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientError
+
+from .exceptions import (
+    AdmissionTimeoutException,
+    InvalidKeyException,
+    NoAddressException,
+    SerialTransportException,
+)
+from .frames import FRAME_FORMAT_VERIFIED, build_scene_frames
+
+try:
+    import serial_asyncio_fast
+except ImportError:  # Only needed for the serial transport
+    serial_asyncio_fast = None
+
+if TYPE_CHECKING:
+    from .device import MotionBlindsRS485Device
+
+DEFAULT_BAUDRATE = 9600
+
+
+def serial_hostname(port: str) -> str:
+    """Name standing in for the hostname of a bus on a serial port, rs485-dev-ttyUSB0."""
+    return "rs485-" + re.sub(r"[^0-9A-Za-z]+", "-", port).strip("-")
+
+
+class Transport(ABC):
+    """How the scene commands of a device reach the RS485 bus."""
+
+    __slots__ = ("_device",)
+
+    name = ""
+    # Whether the bus is behind a box on the network, with an address, a key
+    # and a push channel
+    networked = False
+
+    def __init__(self) -> None:
+        self._device: MotionBlindsRS485Device | None = None
+
+    def attach(self, device: MotionBlindsRS485Device) -> None:
+        """Called by the device using this transport."""
+        self._device = device
+
+    @abstractmethod
+    async def ping(self, timeout: float) -> bool:
+        """Whether the bus can be reached."""
+
+    @abstractmethod
+    async def detect_batch_support(self) -> bool:
+        """Whether several scenes can be sent with one send_scenes."""
+
+    @abstractmethod
+    async def send_scenes(
+        self, command: str, scenes: tuple[int, ...], timeout: float
+    ) -> None:
+        """Run command for scenes, within timeout seconds."""
+
+    async def close(self) -> None:
+        pass
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"name": self.name}
+
+
+class HttpTransport(Transport):
+    """Through the /start and /stop endpoints of a Domotica Box."""
+
+    __slots__ = ()
+
+    name = "http"
+    networked = True
+
+    async def ping(self, timeout: float) -> bool:
+        try:
+            self._device._set_features(await self._device.request(timeout=timeout))
+            return True
+        except AdmissionTimeoutException:
+            # Busy with other requests, their outcome tells about its health
+            return True
+        except (ClientError, asyncio.TimeoutError, NoAddressException, ValueError):
+            # ValueError: an answer that is not JSON, not a healthy box
+            return False
+
+    async def detect_batch_support(self) -> bool:
+        device = self._device
+        if device.supports_batch is None:
+            device._set_features(await device.request(timeout=3))
+        return device.supports_batch
+
+    async def send_scenes(
+        self, command: str, scenes: tuple[int, ...], timeout: float
+    ) -> None:
+        device = self._device
+        if len(scenes) == 1:
+            params = {"scene": scenes[0]}
+        else:
+            params = {"scenes": ",".join(str(scene) for scene in scenes)}
+        if device.key != "":
+            params["key"] = device.key
+        json = await device.request(f"/{command}", params, timeout=timeout)
+        if "status" in json and json["status"] == "error":
+            if "message" in json and json["message"] == "invalid key":
+                device.metrics.record_invalid_key()
+                raise InvalidKeyException("Invalid key")
+
+
+class SerialTransport(Transport):
+    """Straight onto the bus through a USB-RS485 adapter.
+
+    Not for real motors yet: the frames are not verified against a real
+    bus, see frames.FRAME_FORMAT_VERIFIED. Until they are, it refuses to be
+    created unless unverified_frames is given, e.g. for SerialBusSimulator,
+    which parses the same assumed frames. Needs pyserial-asyncio-fast. The
+    port is opened on first use and again after an error, frames are written
+    one command at a time.
+    """
+
+    __slots__ = ("port", "baudrate", "_writer", "_lock")
+
+    name = "serial"
+
+    def __init__(
+        self,
+        port: str,
+        baudrate: int = DEFAULT_BAUDRATE,
+        unverified_frames: bool = False,
+    ) -> None:
+        if not (FRAME_FORMAT_VERIFIED or unverified_frames):
+            raise SerialTransportException(
+                "The scene frame format is not verified against a real bus"
+            )
+        super().__init__()
+        self.port = port
+        self.baudrate = baudrate
+        self._writer: asyncio.StreamWriter | None = None
+        # Frames of concurrent commands must not interleave on the bus
+        self._lock = asyncio.Lock()
+
+    def attach(self, device: MotionBlindsRS485Device) -> None:
+        super().attach(device)
+        device.supports_batch = True
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def _open(self) -> asyncio.StreamWriter:
+        if self._writer is None:
+            if serial_asyncio_fast is None:
+                raise SerialTransportException("pyserial-asyncio-fast is not installed")
+            try:
+                # Nothing is read, the motors do not answer scene frames
+                _, self._writer = await serial_asyncio_fast.open_serial_connection(
+                    url=self.port, baudrate=self.baudrate
+                )
+            except OSError as exception:
+                raise SerialTransportException(
+                    f"Cannot open {self.port}: {exception}"
+                ) from exception
+        return self._writer
+
+    async def ping(self, timeout: float) -> bool:
+        async with self._lock:
+            try:
+                await asyncio.wait_for(self._open(), timeout)
+            except (SerialTransportException, asyncio.TimeoutError):
+                return False
+        return True
+
+    async def detect_batch_support(self) -> bool:
+        return True
+
+    async def _write(self, frames: bytes, timeout: float, endpoint: str) -> None:
+        metrics = self._device.metrics
+        async with self._lock:
+            start_time = time.perf_counter()
+            try:
+                writer = await self._open()
+                writer.write(frames)
+                await asyncio.wait_for(writer.drain(), timeout)
+            except asyncio.TimeoutError:
+                metrics.record_timeout()
+                raise
+            except (OSError, SerialTransportException) as exception:
+                metrics.record_connection_error()
+                # Opened again by the next command, e.g. after the adapter
+                # was plugged back in
+                await self._close()
+                if isinstance(exception, SerialTransportException):
+                    raise
+                raise SerialTransportException(
+                    f"Cannot write to {self.port}: {exception}"
+                ) from exception
+            metrics.record_success(endpoint, time.perf_counter() - start_time)
+
+    async def send_scenes(
+        self, command: str, scenes: tuple[int, ...], timeout: float
+    ) -> None:
+        await self._write(build_scene_frames(command, scenes), timeout, f"/{command}")
+
+    async def _close(self) -> None:
+        if (writer := self._writer) is None:
+            return
+        self._writer = None
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._close()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "port": self.port,
+            "baudrate": self.baudrate,
+            "connected": self.connected,
+        }
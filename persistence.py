@@ -0,0 +1,67 @@
+"""Debounced config entry persistence for the MotionBlinds RS485 integration."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+_LOGGER = logging.getLogger(__name__)
+
+FLUSH_DELAY = 30
+
+
+class ConfigEntryDataWriter:
+    """Collect config entry data changes and write them in one batch."""
+
+    def __init__(self, hass: HomeAssistant, delay: float = FLUSH_DELAY) -> None:
+        self.hass = hass
+        self.delay = delay
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._cancel_flush: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_set(self, entry: ConfigEntry, key: str, value: Any) -> bool:
+        """Schedule a change, returns False if the value is already stored."""
+        pending = self._pending.get(entry.entry_id, {})
+        if pending.get(key, entry.data.get(key)) == value:
+            return False
+        self._pending.setdefault(entry.entry_id, {})[key] = value
+        if self._cancel_flush is None:
+            self._cancel_flush = async_call_later(
+                self.hass, self.delay, self._async_flush_later
+            )
+        return True
+
+    @callback
+    def _async_flush_later(self, _now: datetime) -> None:
+        self._cancel_flush = None
+        self.async_flush()
+
+    @callback
+    def async_flush(self) -> None:
+        """Write all pending changes."""
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+        pending, self._pending = self._pending, {}
+        for entry_id in pending:
+            self._async_write(entry_id, pending[entry_id])
+
+    @callback
+    def async_flush_entry(self, entry_id: str) -> None:
+        """Write pending changes of a single entry, e.g. when it unloads."""
+        if (changes := self._pending.pop(entry_id, None)) is not None:
+            self._async_write(entry_id, changes)
+
+    @callback
+    def _async_write(self, entry_id: str, changes: dict[str, Any]) -> None:
+        if (entry := self.hass.config_entries.async_get_entry(entry_id)) is None:
+            return
+        _LOGGER.debug("Storing %s for %s", changes, entry.title)
+        self.hass.config_entries.async_update_entry(
+            entry, data={**entry.data, **changes}
+        )
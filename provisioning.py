@@ -0,0 +1,106 @@
+"""Bulk provisioning of Domotica Boxes for the MotionBlinds RS485 integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from homeassistant.components.zeroconf import async_get_instance
+from homeassistant.config_entries import SOURCE_IMPORT
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import (
+    CONF_HOSTNAME,
+    CONF_IP_ADDRESS,
+    CONF_KEY,
+    CONF_NETWORKS,
+    DATA_KEY_VALIDATOR,
+    DOMAIN,
+)
+from .motionblinds_rs485.keys import KeyValidator
+from .motionblinds_rs485.provisioning import (
+    ManifestEntry,
+    ProbeResult,
+    async_probe_manifest,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback
+def async_get_key_validator(hass: HomeAssistant) -> KeyValidator:
+    """Get the key validator shared by the config flows and provisioning."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (key_validator := domain_data.get(DATA_KEY_VALIDATOR)) is None:
+        key_validator = domain_data[DATA_KEY_VALIDATOR] = KeyValidator()
+    return key_validator
+
+
+async def _async_create_entry(
+    hass: HomeAssistant, result: ProbeResult, networks: list[str] | None
+) -> str:
+    data = {
+        CONF_HOSTNAME: result.entry.hostname,
+        CONF_IP_ADDRESS: result.ip_address,
+        CONF_KEY: result.key,
+    }
+    if networks is not None:
+        data[CONF_NETWORKS] = networks
+    flow_result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_IMPORT}, data=data
+    )
+    if flow_result["type"] == FlowResultType.CREATE_ENTRY:
+        return "created"
+    return flow_result.get("reason", "aborted")
+
+
+async def async_provision(
+    hass: HomeAssistant,
+    entries: list[ManifestEntry],
+    workers: int,
+    networks: list[str] | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Probe the boxes of a manifest and create config entries for the working ones.
+
+    networks are the CIDR ranges the boxes were found in by a subnet scan.
+    Returns per hostname whether it was reachable, had a valid key and what
+    happened to its config entry.
+    """
+    results = await async_probe_manifest(
+        entries,
+        workers,
+        session=async_get_clientsession(hass),
+        zeroconf=await async_get_instance(hass),
+        key_validator=async_get_key_validator(hass),
+    )
+    ok = [result for result in results if result.ok]
+    outcomes = await asyncio.gather(
+        *(_async_create_entry(hass, result, networks) for result in ok)
+    )
+    configured = {
+        result.entry.hostname: outcome for result, outcome in zip(ok, outcomes)
+    }
+    _LOGGER.info(
+        "Provisioned %s of %s Domotica Boxes", len(configured), len(results)
+    )
+    return {
+        result.entry.hostname: {
+            "reachable": result.reachable,
+            "valid_key": result.valid_key,
+            "ip_address": result.ip_address,
+            "config_entry": configured.get(result.entry.hostname),
+            "error": result.error,
+        }
+        for result in results
+    }
+
+
+def format_summary(summary: dict[str, dict[str, Any]]) -> str:
+    """One line per box that was not configured, for the config flow."""
+    return "\n".join(
+        f"{hostname}: {box['error']}"
+        for hostname, box in summary.items()
+        if box["config_entry"] is None
+    )
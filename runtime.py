@@ -0,0 +1,204 @@
+"""Per config entry runtime of the MotionBlinds RS485 integration."""
+from __future__ import annotations
+
+import logging
+import socket
+from typing import TYPE_CHECKING
+
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.entity import DeviceInfo
+
+from .const import (
+    CONF_HOSTNAME,
+    CONF_IP_ADDRESS,
+    CONF_KEY,
+    CONF_NETWORKS,
+    CONF_SCENE_GROUPS,
+    DATA_ENTITY_RUNTIMES,
+    DATA_ENTRY_WRITER,
+    DATA_HEALTH,
+    DOMAIN,
+    ENTITY_NAME,
+    MANUFACTURER,
+)
+from .motionblinds_rs485.device import MotionBlindsRS485Device
+from .motionblinds_rs485.discovery import address_ttl
+from .motionblinds_rs485.offline import OfflineBuffer
+from .motionblinds_rs485.profiling import profiled
+
+if TYPE_CHECKING:
+    from zeroconf.asyncio import AsyncServiceInfo
+
+    from .discovery import MotionBlindsRS485Discovery
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MotionBlindsRS485Runtime:
+    """The device of one Domotica Box and everything registered for it.
+
+    Created once in async_setup_entry and stored on entry.runtime_data, the
+    entities and services of the box all use this object.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: MotionBlindsRS485ConfigEntry,
+        discovery: MotionBlindsRS485Discovery,
+    ) -> None:
+        self.hass = hass
+        self.entry = entry
+        self.hostname: str = entry.data[CONF_HOSTNAME]
+        self._discovery = discovery
+        self._unsubscribes: list[CALLBACK_TYPE] = []
+        # Scene of the select entity, used by the start and stop buttons
+        self.selected_scene: int | None = None
+        # Reloading is only needed when these change
+        self.scene_groups: dict[str, list] = entry.options.get(CONF_SCENE_GROUPS, {})
+
+        self.device = MotionBlindsRS485Device(
+            f"{self.hostname}.local",
+            key=entry.data[CONF_KEY],
+            use_ha=True,
+            session=async_get_clientsession(hass),
+            zeroconf=discovery.zeroconf,
+            # Sent when the box announces itself again or answers a health poll
+            offline_buffer=OfflineBuffer(),
+            # Scanned when mDNS and DNS do not find the box
+            networks=entry.data.get(CONF_NETWORKS, ()),
+        )
+        if entry.data.get(CONF_IP_ADDRESS) is not None:
+            # Used right away, but revalidated in the background on first use
+            self.device.set_ip_address(entry.data[CONF_IP_ADDRESS], ttl=0)
+
+        self.entity_name = ENTITY_NAME.format(mac_code=self.hostname[-5:-1])
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, self.hostname)},
+            manufacturer=MANUFACTURER,
+            name=self.entity_name,
+            configuration_url=self._configuration_url(entry.data[CONF_KEY]),
+        )
+
+    @property
+    def unique_id(self) -> str:
+        return self.hostname
+
+    @property
+    def available(self) -> bool:
+        """Return whether the Domotica Box responds to health polls."""
+        return self.hass.data[DOMAIN][DATA_HEALTH].is_available(self.device)
+
+    @callback
+    def async_start(self) -> None:
+        """Follow the address of the box, poll its health and listen for events."""
+        if self.device.transport.networked:
+            self._unsubscribes.append(
+                self._discovery.async_register(
+                    self.hostname, self.async_service_update
+                )
+            )
+        self._unsubscribes.append(
+            self.hass.data[DOMAIN][DATA_HEALTH].async_add_device(self.device)
+        )
+        self.device.start_push()
+
+    async def async_stop(self) -> None:
+        """Undo async_start and close the device."""
+        while self._unsubscribes:
+            self._unsubscribes.pop()()
+        await self.device.close()
+
+    @callback
+    def async_register_entity(self, entity_id: str) -> CALLBACK_TYPE:
+        """Make this runtime the target of services called for entity_id."""
+        entity_runtimes: dict[str, MotionBlindsRS485Runtime] = self.hass.data[DOMAIN][
+            DATA_ENTITY_RUNTIMES
+        ]
+        entity_runtimes[entity_id] = self
+
+        @callback
+        def _async_unregister() -> None:
+            if entity_runtimes.get(entity_id) is self:
+                del entity_runtimes[entity_id]
+
+        return _async_unregister
+
+    @callback
+    @profiled
+    def async_service_update(self, async_service_info: AsyncServiceInfo) -> None:
+        if len(async_service_info.addresses) == 0:
+            _LOGGER.warning("Received empty IP address list for %s", self.hostname)
+            self.device.schedule_revalidate()
+            return
+        self.async_set_ip_address(
+            socket.inet_ntoa(async_service_info.addresses[0]),
+            address_ttl(async_service_info),
+        )
+
+    @callback
+    @profiled
+    def async_set_ip_address(self, ip_address: str, ttl: float) -> None:
+        """Use a new address of the box, announced or found by a subnet scan."""
+        if ip_address != self.device.ip_address:
+            _LOGGER.info("Set IP address of %s to %s", self.hostname, ip_address)
+        self.device.set_ip_address(ip_address, ttl)
+        # Only stored when changed, writes of all boxes are batched
+        self.hass.data[DOMAIN][DATA_ENTRY_WRITER].async_set(
+            self.entry, CONF_IP_ADDRESS, ip_address
+        )
+
+    @callback
+    def async_set_networks(self, networks: list[str]) -> None:
+        """Look for the box in these networks when mDNS and DNS do not find it."""
+        self.device.networks = tuple(networks)
+        self.hass.data[DOMAIN][DATA_ENTRY_WRITER].async_set(
+            self.entry, CONF_NETWORKS, list(networks)
+        )
+
+    def _configuration_url(self, key: str) -> str:
+        return f"http://{self.hostname}.local" + (f"/?key={key}" if key != "" else "")
+
+    def set_key(self, key: str) -> None:
+        self.device.set_key(key)
+        device_registry = dr.async_get(self.hass)
+        device = device_registry.async_get_device(identifiers={(DOMAIN, self.hostname)})
+        if device:
+            device_registry.async_update_device(
+                device.id, configuration_url=self._configuration_url(key)
+            )
+
+    async def start(self) -> None:
+        """Start the scene selected in the select entity."""
+        if self.selected_scene is None:
+            raise Exception("No scene selected")
+        await self.device.start(self.selected_scene)
+
+    async def stop(self) -> None:
+        """Stop the scene selected in the select entity."""
+        if self.selected_scene is None:
+            raise Exception("No scene selected")
+        await self.device.stop(self.selected_scene)
+
+
+MotionBlindsRS485ConfigEntry = ConfigEntry[MotionBlindsRS485Runtime]
+
+
+def get_runtime(hass: HomeAssistant, hostname: str) -> MotionBlindsRS485Runtime | None:
+    """Get the runtime of a loaded Domotica Box by its hostname."""
+    entry: MotionBlindsRS485ConfigEntry | None = (
+        hass.config_entries.async_entry_for_domain_unique_id(DOMAIN, hostname)
+    )
+    if entry is None or entry.state is not ConfigEntryState.LOADED:
+        return None
+    return entry.runtime_data
+
+
+def get_entity_runtime(
+    hass: HomeAssistant, entity_id: str
+) -> MotionBlindsRS485Runtime | None:
+    """Get the runtime targeted by a service call for entity_id."""
+    return hass.data[DOMAIN][DATA_ENTITY_RUNTIMES].get(entity_id)
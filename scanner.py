@@ -0,0 +1,36 @@
+"""Subnet scanning for Domotica Boxes of the MotionBlinds RS485 integration."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import HomeAssistant
+
+from .motionblinds_rs485.discovery import DEFAULT_TTL
+from .motionblinds_rs485.scanner import DEFAULT_CONCURRENCY, ScanResult, async_scan
+from .runtime import get_runtime
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_scan_networks(
+    hass: HomeAssistant, networks: list[str], concurrency: int = DEFAULT_CONCURRENCY
+) -> list[ScanResult]:
+    """Scan CIDR ranges for boxes, updating the address of the configured ones.
+
+    For networks mDNS does not reach. The configured boxes found keep the
+    ranges, they are scanned again when a box moves. Raises ValueError for
+    invalid ranges.
+    """
+    results = await async_scan(networks, concurrency=concurrency)
+    for result in results:
+        if result.hostname is None:
+            continue
+        if (runtime := get_runtime(hass, result.hostname)) is not None:
+            # Revalidated like a zeroconf address, the last known one is kept
+            # when that fails
+            runtime.async_set_ip_address(result.address, DEFAULT_TTL)
+            runtime.async_set_networks(networks)
+    _LOGGER.info(
+        "Found %s Domotica Boxes in %s", len(results), ", ".join(networks)
+    )
+    return results
@@ -1,55 +1,25 @@
 """Select entities for the MotionBlinds RS485 integration."""
+from __future__ import annotations
 
 import logging
-from collections.abc import Callable
-from datetime import datetime
+from typing import Any
 
 from homeassistant.components.select import SelectEntity, SelectEntityDescription
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import PERCENTAGE, EntityCategory
+from homeassistant.const import EntityCategory
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_call_later
-from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.helpers import device_registry as dr
-
-from .motionblinds_rs485.device import MotionBlindsRS485Device
-
-import socket
-
-from homeassistant.components.zeroconf import (
-    async_get_async_instance,
-    async_get_zeroconf,
-    async_get_instance,
-    HaAsyncServiceBrowser,
-    HaAsyncZeroconf,
-    HaZeroconf,
-)
-
-from zeroconf import (
-    BadTypeInNameException,
-    InterfaceChoice,
-    IPVersion,
-    ServiceStateChange,
-)
-
-from zeroconf.asyncio import (
-    AsyncServiceBrowser,
-    AsyncServiceInfo,
-    AsyncZeroconf,
-    AsyncZeroconfServiceTypes,
-)
 
 from .const import (
+    ATTR_CIRCUIT_BREAKER,
+    ATTR_RUNNING_SCENES,
     ATTR_SCENE,
-    CONF_IP_ADDRESS,
-    CONF_KEY,
+    DATA_HEALTH,
     DOMAIN,
     ICON_SCENE,
-    ENTITY_NAME,
-    CONF_HOSTNAME,
-    MANUFACTURER,
+    SCENE_OPTIONS,
 )
+from .motionblinds_rs485.profiling import profiled
+from .runtime import MotionBlindsRS485ConfigEntry, MotionBlindsRS485Runtime
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -62,130 +32,78 @@ SELECT_TYPES: dict[str, SelectEntityDescription] = {
         translation_key=ATTR_SCENE,
         icon=ICON_SCENE,
         entity_category=EntityCategory.CONFIG,
-        options=list(str(num) for num in range(1, 16)),
+        options=SCENE_OPTIONS,
         has_entity_name=True,
     )
 }
 
 
 async def async_setup_entry(
-    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+    hass: HomeAssistant,
+    entry: MotionBlindsRS485ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up speed select entities based on a config entry."""
     _LOGGER.info("Setting up SpeedSelect")
 
     _LOGGER.info("Setting up cover with data %s", entry.data)
 
-    scene_select = SceneSelect(entry)
-    hass.data[DOMAIN][entry.entry_id] = scene_select
-    async_add_entities([scene_select])
+    async_add_entities([SceneSelect(entry.runtime_data)])
 
 
 class SceneSelect(SelectEntity):
     """Representation of a speed select entity."""
 
-    rs485_device: MotionBlindsRS485Device
-    hostname: str
-    zeroconf: HaAsyncZeroconf
-    async_service_browser: HaAsyncServiceBrowser
-
-    def __init__(self, entry: ConfigEntry) -> None:
+    def __init__(self, runtime: MotionBlindsRS485Runtime) -> None:
         """Initialize the speed select entity."""
         super().__init__()
-        self.hostname = entry.data[CONF_HOSTNAME]
+        self.runtime = runtime
         self.entity_description = SELECT_TYPES[ATTR_SCENE]
-        self.config_entry: ConfigEntry = entry
-
-        self._attr_unique_id: str = self.hostname
+        self._attr_unique_id: str = runtime.unique_id
         self._attr_current_option: str = None
-        self._attr_name: str = ENTITY_NAME.format(mac_code=self.hostname[-5:-1])
-        self._attr_device_info: DeviceInfo = DeviceInfo(
-            identifiers={(DOMAIN, self.hostname)},
-            manufacturer=MANUFACTURER,
-            name=self._attr_name,
-            configuration_url=f"http://{self.hostname}.local"
-            + (
-                f"/?key={self.config_entry.data[CONF_KEY]}"
-                if self.config_entry.data[CONF_KEY] != ""
-                else ""
-            ),
-        )
-
-    def set_key(self, key: str) -> None:
-        self.rs485_device.set_key(key)
-        device_registry = dr.async_get(self.hass)
-        device = device_registry.async_get_device(identifiers={(DOMAIN, self.hostname)})
-        if device:
-            device_registry.async_update_device(
-                device.id,
-                configuration_url=f"http://{self.hostname}.local"
-                + (f"/?key={key}" if key != "" else ""),
-            )
+        self._attr_name: str = runtime.entity_name
+        self._attr_device_info = runtime.device_info
 
+    @profiled
     async def async_added_to_hass(self) -> None:
         """Run when entity about to be added."""
-        self.rs485_device = MotionBlindsRS485Device(
-            f"{self.hostname}.local", key=self.config_entry.data[CONF_KEY], use_ha=True
+        # Services address the box through this entity
+        self.async_on_remove(self.runtime.async_register_entity(self.entity_id))
+        device = self.runtime.device
+        self.async_on_remove(
+            self.hass.data[DOMAIN][DATA_HEALTH].async_add_listener(
+                device, self.async_write_ha_state
+            )
         )
-        if (
-            CONF_IP_ADDRESS in self.config_entry.data
-            and self.config_entry.data[CONF_IP_ADDRESS] is not None
-        ):
-            self.rs485_device.set_ip_address(self.config_entry.data[CONF_IP_ADDRESS])
-        zeroconf_types = await async_get_zeroconf(self.hass)
-        self.zeroconf: HaZeroconf = await async_get_instance(self.hass)
-        self.async_service_browser = HaAsyncServiceBrowser(
-            False,
-            self.zeroconf,
-            list(zeroconf_types),
-            handlers=[self.async_service_update],
+        self.async_on_remove(
+            device.circuit_breaker.add_listener(self.async_write_ha_state)
         )
+        self.async_on_remove(device.add_event_listener(self._async_handle_event))
         return await super().async_added_to_hass()
 
     @callback
-    def async_service_update(
-        self,
-        zeroconf: HaZeroconf,
-        service_type: str,
-        name: str,
-        state_change: ServiceStateChange,
-    ) -> None:
-        # print(zeroconf)
-        # print(name)
-        # print(service_type)
-        # print(state_change)
-        if self.hostname in name:
-            async_service_info = AsyncServiceInfo(service_type, name)
-            async_service_info.load_from_cache(self.zeroconf)
-            # print(async_service_info.get_address_and_nsec_records())
-            if len(async_service_info.addresses) == 0:
-                _LOGGER.warning("Received empty IP address list for %s", self.hostname)
-                self.rs485_device.set_ip_address("10.15.3.32")
-            else:
-                ip_address = socket.inet_ntoa(async_service_info.addresses[0])
-                _LOGGER.info("Set IP address of %s to %s", self.hostname, ip_address)
-                self.rs485_device.set_ip_address(ip_address)
-                updated_data = {
-                    **self.config_entry.data,
-                    CONF_IP_ADDRESS: ip_address,
-                }
-                self.hass.config_entries.async_update_entry(
-                    self.config_entry,
-                    data=updated_data,
-                )
+    @profiled
+    def _async_handle_event(self, event: dict[str, Any]) -> None:
+        self.async_write_ha_state()
 
+    @property
+    @profiled
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the circuit breaker state and the running scenes of the Domotica Box."""
+        return {
+            ATTR_CIRCUIT_BREAKER: self.runtime.device.circuit_breaker.state,
+            ATTR_RUNNING_SCENES: sorted(self.runtime.device.running_scenes),
+        }
+
+    @property
+    def available(self) -> bool:
+        """Return whether the Domotica Box responds to health polls."""
+        return self.runtime.available
+
+    @profiled
     async def async_select_option(self, option: str) -> None:
         """Change the selected speed_level."""
         _LOGGER.info("Selected scene %s", option)
         self._attr_current_option = option
+        self.runtime.selected_scene = int(option)
         self.async_write_ha_state()
-
-    async def start(self):
-        if self.current_option is None:
-            raise Exception("No scene selected")
-        await self.rs485_device.start(int(self._attr_current_option))
-
-    async def stop(self):
-        if self.current_option is None:
-            raise Exception("No scene selected")
-        await self.rs485_device.stop(int(self._attr_current_option))
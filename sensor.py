@@ -0,0 +1,241 @@
+"""Diagnostic sensor entities for the MotionBlinds RS485 integration."""
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    ATTR_BUFFERED_COMMANDS,
+    ATTR_CONNECTION_ERRORS,
+    ATTR_DROPPED_COMMANDS,
+    ATTR_INVALID_KEY_ERRORS,
+    ATTR_LAST_CONTACT,
+    ATTR_LATENCY_P50,
+    ATTR_LATENCY_P95,
+    ATTR_QUEUE_WAIT_P95,
+    ATTR_TIMEOUTS,
+)
+
+if TYPE_CHECKING:
+    from .motionblinds_rs485.metrics import DeviceMetrics
+    from .runtime import MotionBlindsRS485ConfigEntry, MotionBlindsRS485Runtime
+
+_LOGGER = logging.getLogger(__name__)
+
+PARALLEL_UPDATES = 0
+
+# Metrics change with every request, including health polls, so the state of
+# a sensor is written at most this often
+MIN_WRITE_INTERVAL = 60
+
+
+def _milliseconds(seconds: float | None) -> float | None:
+    return round(seconds * 1000) if seconds is not None else None
+
+
+def _timestamp(timestamp: float | None) -> datetime | None:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+@dataclass
+class MetricSensorEntityDescription(SensorEntityDescription):
+    value_callback: Callable[[DeviceMetrics], Any] | None = None
+
+
+SENSOR_TYPES: dict[str, MetricSensorEntityDescription] = {
+    ATTR_LATENCY_P50: MetricSensorEntityDescription(
+        key=ATTR_LATENCY_P50,
+        translation_key=ATTR_LATENCY_P50,
+        entity_registry_enabled_default=False,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: _milliseconds(
+            metrics.overall_latency.percentile(50)
+        ),
+    ),
+    ATTR_LATENCY_P95: MetricSensorEntityDescription(
+        key=ATTR_LATENCY_P95,
+        translation_key=ATTR_LATENCY_P95,
+        entity_registry_enabled_default=False,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: _milliseconds(
+            metrics.overall_latency.percentile(95)
+        ),
+    ),
+    ATTR_QUEUE_WAIT_P95: MetricSensorEntityDescription(
+        key=ATTR_QUEUE_WAIT_P95,
+        translation_key=ATTR_QUEUE_WAIT_P95,
+        entity_registry_enabled_default=False,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: _milliseconds(
+            metrics.queue_wait.percentile(95)
+        ),
+    ),
+    ATTR_TIMEOUTS: MetricSensorEntityDescription(
+        key=ATTR_TIMEOUTS,
+        translation_key=ATTR_TIMEOUTS,
+        entity_registry_enabled_default=False,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: metrics.timeouts,
+    ),
+    ATTR_CONNECTION_ERRORS: MetricSensorEntityDescription(
+        key=ATTR_CONNECTION_ERRORS,
+        translation_key=ATTR_CONNECTION_ERRORS,
+        entity_registry_enabled_default=False,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: metrics.connection_errors,
+    ),
+    ATTR_INVALID_KEY_ERRORS: MetricSensorEntityDescription(
+        key=ATTR_INVALID_KEY_ERRORS,
+        translation_key=ATTR_INVALID_KEY_ERRORS,
+        entity_registry_enabled_default=False,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: metrics.invalid_key_errors,
+    ),
+    ATTR_BUFFERED_COMMANDS: MetricSensorEntityDescription(
+        key=ATTR_BUFFERED_COMMANDS,
+        translation_key=ATTR_BUFFERED_COMMANDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: metrics.buffered_commands,
+    ),
+    ATTR_DROPPED_COMMANDS: MetricSensorEntityDescription(
+        key=ATTR_DROPPED_COMMANDS,
+        translation_key=ATTR_DROPPED_COMMANDS,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: metrics.dropped_commands,
+    ),
+    ATTR_LAST_CONTACT: MetricSensorEntityDescription(
+        key=ATTR_LAST_CONTACT,
+        translation_key=ATTR_LAST_CONTACT,
+        entity_registry_enabled_default=False,
+        device_class=SensorDeviceClass.TIMESTAMP,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        has_entity_name=True,
+        value_callback=lambda metrics: _timestamp(metrics.last_success),
+    ),
+}
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: MotionBlindsRS485ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up diagnostic sensors based on a config entry."""
+    runtime = entry.runtime_data
+
+    _LOGGER.info("Setting up sensors")
+    async_add_entities(
+        [
+            MetricSensor(runtime, entity_description)
+            for entity_description in SENSOR_TYPES.values()
+        ]
+    )
+
+
+class MetricSensor(SensorEntity):
+    """Representation of a request metric of a Domotica Box."""
+
+    entity_description: MetricSensorEntityDescription
+
+    # Written when the metrics change, nothing to poll
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        runtime: MotionBlindsRS485Runtime,
+        entity_description: MetricSensorEntityDescription,
+    ) -> None:
+        """Initialize the metric sensor."""
+        self.entity_description = entity_description
+        self._runtime = runtime
+        self._attr_unique_id = f"{runtime.unique_id}_{entity_description.key}"
+        self._attr_device_info = runtime.device_info
+        self._written_value: Any = None
+        self._last_write = 0.0
+        self._cancel_write: CALLBACK_TYPE | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Run when entity about to be added."""
+        self.async_on_remove(
+            self._runtime.device.metrics.add_listener(
+                self._async_metrics_updated
+            )
+        )
+        self.async_on_remove(self._async_cancel_write)
+        self._written_value = self.native_value
+        self._last_write = time.monotonic()
+        return await super().async_added_to_hass()
+
+    @callback
+    def _async_metrics_updated(self) -> None:
+        if self._cancel_write is not None or self.native_value == self._written_value:
+            # Already scheduled, or nothing this sensor shows changed
+            return
+        delay = self._last_write + MIN_WRITE_INTERVAL - time.monotonic()
+        if delay <= 0:
+            self._async_write()
+            return
+        self._cancel_write = async_call_later(
+            self.hass, delay, self._async_write_later
+        )
+
+    @callback
+    def _async_write_later(self, _now: datetime) -> None:
+        self._cancel_write = None
+        if self.native_value != self._written_value:
+            self._async_write()
+
+    @callback
+    def _async_write(self) -> None:
+        self._written_value = self.native_value
+        self._last_write = time.monotonic()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_cancel_write(self) -> None:
+        if self._cancel_write is not None:
+            self._cancel_write()
+            self._cancel_write = None
+
+    @property
+    def native_value(self) -> Any:
+        """Return the value of the metric."""
+        return self.entity_description.value_callback(
+            self._runtime.device.metrics
+        )